@@ -29,12 +29,14 @@ async def received_password_login(update: Update, context: ContextTypes.DEFAULT_
     email = session_manager.get_session_data(user_id, "email_attempt")
     password = update.message.text
 
-    result = api_client.login_user(email, password)
+    result = await api_client.login_user(email, password)
 
     if result.get("success"):
         user_data = result.get("data", {})
         session_manager.set_session_data(user_id, "user", user_data)
         session_manager.set_session_data(user_id, "cookies", result.get("cookies"))
+        # A profile cached for a previous account must not show up under the new one.
+        session_manager.invalidate_profile(user_id)
         session_manager.clear_session_data(user_id, "email_attempt")
         await update.message.reply_text(f"✅ Успешный вход, {user_data.get('fullName', 'пользователь')}!")
         await show_menu(update, context)
@@ -118,7 +120,7 @@ async def received_city_register(update: Update, context: ContextTypes.DEFAULT_T
 
     # Call api_client.register_user, passing telegram_username to the 'telegram_id' parameter
     # The api_client.register_user function will use "telegramId" as the key in the payload.
-    result = api_client.register_user(
+    result = await api_client.register_user(
         full_name=fullName,
         email=email,
         password=password,
@@ -132,6 +134,7 @@ async def received_city_register(update: Update, context: ContextTypes.DEFAULT_T
         user_data = result.get("data", {})
         session_manager.set_session_data(user_id, "user", user_data)
         session_manager.set_session_data(user_id, "cookies", result.get("cookies"))
+        session_manager.invalidate_profile(user_id)
         # The success message can still use fullName
         success_message = f"✅ Регистрация успешна, {user_data.get('fullName', 'новый пользователь')}!"
         if telegram_username:
@@ -181,7 +184,7 @@ async def logout_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await show_menu(update, context)
         return
 
-    result = api_client.logout_user(cookies)
+    result = await api_client.logout_user(cookies)
 
     if result.get("success"):
         session_manager.clear_entire_session(user_id)
@@ -1,11 +1,15 @@
-from telegram import Update, ReplyKeyboardRemove
+import json
+from typing import List
+from telegram import Update, ReplyKeyboardRemove, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.services import api_client
+from bot.services.image_processing import select_photo_size
+from bot.services.render_cache import renders, signature
+from bot.services.sort_orders import sort_books
 from bot.states import session_manager
 from bot.utils.helpers import (
     check_user_logged_in,
     handle_api_error,
-    encode_image_to_base64,
     format_book_message
 )
 from bot.keyboards import reply_keyboards, inline_keyboards
@@ -133,13 +137,10 @@ async def image_received_handler(update: Update, context: ContextTypes.DEFAULT_T
         await show_menu(update, context)
         return ConversationHandler.END
 
-    photo = await update.message.photo[-1].get_file()
-    photo_bytes = await photo.download_as_bytearray()
-    image_data_url = encode_image_to_base64(photo_bytes, mime_type="image/jpeg")
-    context.user_data['new_book_data']['image'] = image_data_url
+    photo = await select_photo_size(update.message.photo).get_file()
 
     await update.message.reply_text("⏳ Добавляю книгу...", reply_markup=ReplyKeyboardRemove())
-    result = api_client.create_book(cookies, context.user_data['new_book_data'])
+    result = await api_client.create_book_with_image(cookies, context.user_data['new_book_data'], photo.file_path)
 
     if result.get("success"):
         await update.message.reply_text("✅ Книга успешно добавлена!")
@@ -158,6 +159,81 @@ async def cancel_create_book_handler(update: Update, context: ContextTypes.DEFAU
     return ConversationHandler.END
 
 
+def _my_books_signature(books) -> str:
+    # Books the backend stamps with updatedAt are identified by id and version; any
+    # other book by its full content.
+    return signature(
+        f"{book.get('_id')}:{book['updatedAt']}" if book.get('updatedAt')
+        else json.dumps(book, sort_keys=True, default=str)
+        for book in books
+    )
+
+
+def _render_my_books(books) -> List[str]:
+    # The formatted, 4096-char chunked list; re-sorting or re-opening an unchanged
+    # list reuses it.
+    key = ("my_books", _my_books_signature(books))
+    parts_to_send = renders.get(key)
+    if parts_to_send is not None:
+        return parts_to_send
+
+    message_parts = ["Ваши книги:\n"]
+    for i, book_item in enumerate(books):
+        message_parts.append(f"<b>{i}.</b> {format_book_message(book_item, owner_name='Вы')}")
+
+    full_message = "\n\n".join(message_parts)
+    if len(full_message) > 4096:
+        parts_to_send = []
+        current_part = "Ваши книги (часть):\n"
+        for book_idx, book_msg_content in enumerate(message_parts[1:]):
+            if len(current_part) + len(book_msg_content) + 2 > 4096:
+                parts_to_send.append(current_part)
+                current_part = "Ваши книги (продолжение):\n" + book_msg_content
+            elif book_idx == 0 and current_part == "Ваши книги (часть):\n":
+                 current_part += book_msg_content
+            else:
+                current_part += "\n\n" + book_msg_content
+        parts_to_send.append(current_part)
+    else:
+        parts_to_send = [full_message]
+    renders.put(key, parts_to_send)
+    return parts_to_send
+
+
+def _my_books_in_order(context: ContextTypes.DEFAULT_TYPE) -> List[dict]:
+    # user_data keeps the list in backend order plus the chosen sort mode; my books are
+    # a short per-user list, so it is simply sorted with the catalog's keys when shown.
+    return sort_books(context.user_data.get('my_books_cache') or [],
+                      context.user_data.get('my_books_sort', 'default'))
+
+
+async def _send_my_books_list(message, context: ContextTypes.DEFAULT_TYPE) -> None:
+    parts_to_send = _render_my_books(_my_books_in_order(context))
+    for i, part in enumerate(parts_to_send):
+        final_markup = reply_keyboards.my_books_action_markup if i == len(parts_to_send) -1 else ReplyKeyboardRemove()
+        await message.reply_text(part, parse_mode="HTML", reply_markup=final_markup)
+
+    # The reply keyboard above carries the actions, so the sort button gets its own message.
+    sort_mode = context.user_data.get('my_books_sort', 'default')
+    await message.reply_text(
+        "Порядок списка:",
+        reply_markup=InlineKeyboardMarkup([[inline_keyboards.create_sort_button('my_books_cache', sort_mode)]])
+    )
+
+
+async def my_books_sort_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    if not context.user_data.get('my_books_cache'):
+        await query.edit_message_text("Список книг не загружен. Пожалуйста, сначала вызовите /mybooks.")
+        return MY_BOOKS_CHOOSE_ACTION
+
+    context.user_data['my_books_sort'] = query.data.rsplit("_", 1)[-1]
+    await _send_my_books_list(query.message, context)
+    await query.message.delete()
+    return MY_BOOKS_CHOOSE_ACTION
+
+
 async def my_books_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if not await check_user_logged_in(update, context):
         return ConversationHandler.END
@@ -165,7 +241,7 @@ async def my_books_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     user_id = update.effective_user.id
     cookies = session_manager.get_cookies(user_id)
     await update.message.reply_text("⏳ Загружаю ваши книги...", reply_markup=ReplyKeyboardRemove())
-    result = api_client.get_my_books(cookies)
+    result = await api_client.get_my_books(cookies)
 
     if result.get("success"):
         books = result.get("data")
@@ -174,34 +250,9 @@ async def my_books_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             await show_menu(update, context)
             return ConversationHandler.END
 
+        context.user_data['my_books_sort'] = 'default'
         context.user_data['my_books_cache'] = books
-        message_parts = ["Ваши книги:\n"]
-        for i, book_item in enumerate(books):
-            message_parts.append(f"<b>{i}.</b> {format_book_message(book_item, owner_name='Вы')}")
-
-        full_message = "\n\n".join(message_parts)
-        if len(full_message) > 4096:
-            parts_to_send = []
-            current_part = "Ваши книги (часть):\n"
-            for book_idx, book_msg_content in enumerate(message_parts[1:]):
-                if len(current_part) + len(book_msg_content) + 2 > 4096:
-                    parts_to_send.append(current_part)
-                    current_part = "Ваши книги (продолжение):\n" + book_msg_content
-                elif book_idx == 0 and current_part == "Ваши книги (часть):\n":
-                     current_part += book_msg_content
-                else:
-                    current_part += "\n\n" + book_msg_content
-            parts_to_send.append(current_part)
-
-            for i, part in enumerate(parts_to_send):
-                final_markup = reply_keyboards.my_books_action_markup if i == len(parts_to_send) -1 else ReplyKeyboardRemove()
-                await update.message.reply_text(part, parse_mode="HTML", reply_markup=final_markup)
-        else:
-            await update.message.reply_text(
-                full_message,
-                reply_markup=reply_keyboards.my_books_action_markup,
-                parse_mode="HTML"
-            )
+        await _send_my_books_list(update.message, context)
         return MY_BOOKS_CHOOSE_ACTION
     else:
         await handle_api_error(update, result, "⚠️ Не удалось получить список ваших книг.")
@@ -242,7 +293,7 @@ async def choose_action_handler(update: Update, context: ContextTypes.DEFAULT_TY
 async def choose_book_index_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         index = int(update.message.text)
-        books = context.user_data.get('my_books_cache')
+        books = _my_books_in_order(context)
         if not books or not (0 <= index < len(books)):
             await update.message.reply_text("🚫 Неверный номер книги. Пожалуйста, введите номер из списка или /cancel.")
             return MY_BOOKS_CHOOSE_BOOK_INDEX
@@ -290,7 +341,7 @@ async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_T
             return ConversationHandler.END
 
         await update.message.reply_text("⏳ Удаляю книгу...", reply_markup=ReplyKeyboardRemove())
-        result = api_client.delete_book(cookies, book_id)
+        result = await api_client.delete_book(cookies, book_id)
         if result.get("success"):
             await update.message.reply_text("✅ Книга удалена.")
         else:
@@ -434,7 +485,7 @@ async def save_edited_book_handler(update: Update, context: ContextTypes.DEFAULT
         return ConversationHandler.END
 
     await update.message.reply_text("⏳ Сохраняю изменения...", reply_markup=ReplyKeyboardRemove())
-    result = api_client.update_book(cookies, book_id, complete_payload)
+    result = await api_client.update_book(cookies, book_id, complete_payload)
 
     if result.get("success"):
         await update.message.reply_text("✅ Книга успешно обновлена.")
@@ -19,4 +19,8 @@ RECOMMENDATIONS_Browse = range(52, 53)
 
 ALL_BOOKS_PAGINATING = 60
 
-RECOMMENDATIONS_PAGINATING = 61
\ No newline at end of file
+RECOMMENDATIONS_PAGINATING = 61
+
+SEARCH_WAITING_QUERY, SEARCH_PAGINATING = range(62, 64)
+
+FILTER_SELECTING, FILTER_PAGINATING = range(64, 66)
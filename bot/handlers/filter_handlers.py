@@ -0,0 +1,82 @@
+from telegram import Update, ReplyKeyboardRemove
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes, ConversationHandler
+from bot import config
+from bot.keyboards import inline_keyboards
+from bot.services import api_client
+from bot.services.facet_index import FACETS, FacetIndex, bitmap_count
+from bot.utils.helpers import handle_api_error
+from .conversation_states import FILTER_SELECTING, FILTER_PAGINATING
+from .general_handlers import recommendations_cancel_action
+from .pagination_helpers import send_or_edit_paginated_books, filter_cursor
+
+# Free-text facets (language, type) show at most this many values, the most common first.
+FILTER_MAX_VALUES = getattr(config, "FILTER_MAX_VALUES", 8)
+
+FILTER_PROMPT = "🧮 Выберите фильтры. В скобках — сколько книг останется:"
+
+
+def _build_filter_keyboard(context: ContextTypes.DEFAULT_TYPE):
+    facet_index = api_client.catalog.derived("facet_index", FacetIndex)
+    selection = context.user_data.setdefault('filter_selection', {})
+    options = {facet: facet_index.counts(selection, facet, limit=FILTER_MAX_VALUES) for facet in FACETS}
+    # Remember what each button index meant when this keyboard was drawn.
+    context.user_data['filter_options'] = {facet: [value for value, _ in values] for facet, values in options.items()}
+    total = bitmap_count(facet_index.matching(selection))
+    return inline_keyboards.create_filter_keyboard(options, selection, total)
+
+
+async def filter_start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text("⏳ Загружаю каталог...", reply_markup=ReplyKeyboardRemove())
+    result = await api_client.get_all_books()
+    if not result.get("success"):
+        await handle_api_error(update, result, "⚠️ Ошибка при получении списка книг.")
+        return ConversationHandler.END
+
+    context.user_data['filter_selection'] = {}
+    await update.message.reply_text(FILTER_PROMPT, reply_markup=_build_filter_keyboard(context))
+    return FILTER_SELECTING
+
+
+async def filter_selection_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    callback_data = query.data
+
+    if callback_data == "filter_ignore":
+        await query.answer()
+        return FILTER_SELECTING
+    if callback_data == "filter_cancel":
+        return await recommendations_cancel_action(update, context)
+
+    await api_client.get_all_books()
+    selection = context.user_data.setdefault('filter_selection', {})
+
+    if callback_data == "filter_show":
+        if not api_client.catalog.derived("facet_index", FacetIndex).matching(selection):
+            await query.answer("⚠️ Под выбранные фильтры не подходит ни одна книга.", show_alert=True)
+            return FILTER_SELECTING
+        # Only the selection is kept per user; pages are looked up in the shared index.
+        context.user_data['filter_books_list'] = filter_cursor(selection)
+        await send_or_edit_paginated_books(update, context, view_key='filter_books_list', page=0)
+        return FILTER_PAGINATING
+
+    if callback_data == "filter_reset":
+        selection.clear()
+    elif callback_data.startswith("filter_toggle_"):
+        _, _, facet, index = callback_data.split("_")
+        options = context.user_data.get('filter_options', {}).get(facet, [])
+        if index.isdigit() and int(index) < len(options):
+            values = selection.setdefault(facet, set())
+            value = options[int(index)]
+            if value in values:
+                values.remove(value)
+            else:
+                values.add(value)
+
+    await query.answer()
+    try:
+        await query.edit_message_reply_markup(reply_markup=_build_filter_keyboard(context))
+    except BadRequest as e:
+        if "Message is not modified" not in str(e):
+            raise
+    return FILTER_SELECTING
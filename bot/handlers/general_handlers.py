@@ -1,16 +1,19 @@
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.keyboards import reply_keyboards, inline_keyboards
-from bot.services import api_client
+from bot.services import api_client, recommender
+from bot.services.category_index import CategoryIndex
 from bot.states import session_manager
 from bot.utils.helpers import handle_api_error
 from .conversation_states import (
     RECOMMENDATIONS_SELECTING_GENRES,
     ALL_BOOKS_PAGINATING,
-    RECOMMENDATIONS_PAGINATING
+    RECOMMENDATIONS_PAGINATING,
+    SEARCH_PAGINATING,
+    FILTER_PAGINATING
 )
 from bot.handlers.menu import show_menu
-from .pagination_helpers import send_or_edit_paginated_books
+from .pagination_helpers import send_or_edit_paginated_books, catalog_cursor, ids_cursor, set_cursor_sort
 
 
 async def book_paginator_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -26,11 +29,30 @@ async def book_paginator_callback(update: Update, context: ContextTypes.DEFAULT_
         return
 
     await send_or_edit_paginated_books(update, context, view_key, page)
+    return _paginating_state(view_key)
 
+
+def _paginating_state(view_key: str):
     if view_key == 'all_books_list':
         return ALL_BOOKS_PAGINATING
     elif view_key == 'rec_books_list':
         return RECOMMENDATIONS_PAGINATING
+    elif view_key == 'search_books_list':
+        return SEARCH_PAGINATING
+    elif view_key == 'filter_books_list':
+        return FILTER_PAGINATING
+
+
+async def book_sort_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    view_key, sort_mode = query.data[len("sort_"):].rsplit("_", 1)
+
+    cursor = context.user_data.get(view_key)
+    if cursor:
+        set_cursor_sort(cursor, sort_mode)
+    # Stay on the page the user was looking at.
+    await send_or_edit_paginated_books(update, context, view_key, context.user_data.get(f'{view_key}_page', 0))
+    return _paginating_state(view_key)
 
 
 async def recommendations_cancel_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -46,7 +68,8 @@ async def recommendations_cancel_action(update: Update, context: ContextTypes.DE
 
     await show_menu(update, context)
 
-    for key in ['all_categories_map', 'selected_rec_category_ids', 'rec_books_list', 'all_books_list']:
+    for key in ['all_categories_map', 'selected_rec_category_ids', 'rec_books_list', 'all_books_list',
+                'search_books_list', 'filter_selection', 'filter_options', 'filter_books_list']:
         context.user_data.pop(key, None)
 
     return ConversationHandler.END
@@ -56,7 +79,7 @@ async def list_all_books_command(update: Update, context: ContextTypes.DEFAULT_T
     cookies = session_manager.get_cookies(user_id)
 
     await update.message.reply_text("⏳ Загружаю список книг...", reply_markup=ReplyKeyboardRemove())
-    result = api_client.get_all_books(cookies=cookies)
+    result = await api_client.get_all_books(cookies=cookies)
 
     if result.get("success"):
         books_data = result.get("data")
@@ -64,7 +87,7 @@ async def list_all_books_command(update: Update, context: ContextTypes.DEFAULT_T
             await update.message.reply_text("❗️Нет доступных книг в каталоге.")
             return ConversationHandler.END
 
-        context.user_data['all_books_list'] = books_data
+        context.user_data['all_books_list'] = catalog_cursor()
         await send_or_edit_paginated_books(update, context, view_key='all_books_list', page=0)
         return ALL_BOOKS_PAGINATING
     else:
@@ -80,14 +103,15 @@ async def recommendations_start_command(update: Update, context: ContextTypes.DE
 
     cookies = session_manager.get_cookies(user_id)
     await update.message.reply_text("⏳ Загружаю список жанров...", reply_markup=ReplyKeyboardRemove())
-    categories_result = api_client.get_all_categories(cookies)
+    categories_result = await api_client.get_all_categories(cookies)
 
     if not categories_result.get("success") or not categories_result.get("data"):
         await handle_api_error(update, categories_result, "⚠️ Не удалось загрузить жанры.")
         return ConversationHandler.END
 
-    all_categories_list = categories_result.get("data")
-    context.user_data['all_categories_map'] = {cat['_id']: cat['name'] for cat in all_categories_list}
+    context.user_data['all_categories_map'] = api_client.categories.derived(
+        "categories_map", lambda categories: {cat['_id']: cat['name'] for cat in categories}
+    )
     context.user_data.setdefault('selected_rec_category_ids', set())
 
     keyboard = inline_keyboards.create_genre_selection_keyboard(
@@ -121,9 +145,15 @@ async def handle_genre_selection_callback(update: Update, context: ContextTypes.
             return RECOMMENDATIONS_SELECTING_GENRES
 
         await query.edit_message_text("💾 Сохраняю ваши предпочтения и ищу книги...")
-        api_client.update_user_preferences(cookies, list(selected_ids))
+        save_result, all_books_result = await api_client.gather_requests(
+            api_client.update_user_preferences(cookies, list(selected_ids)),
+            api_client.get_all_books(cookies)
+        )
+        session_manager.invalidate_profile(user_id)
+        if not save_result.get("success"):
+            print(f"Error saving preferences for user {user_id}: {save_result.get('error')}")
 
-        return await show_recommendations_after_selection(update, context, cookies)
+        return await show_recommendations_after_selection(update, context, all_books_result)
 
     elif callback_data == "rec_genre_cancel":
         return await recommendations_cancel_action(update, context)
@@ -141,30 +171,23 @@ async def handle_genre_selection_callback(update: Update, context: ContextTypes.
 
 
 async def show_recommendations_after_selection(update: Update, context: ContextTypes.DEFAULT_TYPE,
-                                               cookies: dict) -> int:
-    all_books_result = api_client.get_all_books(cookies)
-    user_prefs_result = api_client.get_user_current_preferences(cookies)
-
-    if not all_books_result.get("success") or not user_prefs_result.get("success"):
+                                               all_books_result: dict) -> int:
+    if not all_books_result.get("success"):
         await handle_api_error(update, all_books_result, "Не удалось получить книги или предпочтения.")
         return ConversationHandler.END
 
-    all_books = all_books_result.get("data", [])
-    preferred_category_ids = user_prefs_result.get("data", [])
+    # The preferences were just chosen in this conversation, no need to ask the backend.
+    preferred_category_ids = list(context.user_data.get('selected_rec_category_ids', ()))
     all_categories_map = context.user_data.get('all_categories_map', {})
 
     preferred_category_names = {all_categories_map.get(cat_id) for cat_id in preferred_category_ids if
                                 cat_id in all_categories_map}
 
-    recommended_books = []
-    if all_books:
-        for book in all_books:
-            book_categories_list = book.get("categories", [])
-            book_category_names = {
-                cat.get("name") for cat in book_categories_list if isinstance(cat, dict) and "name" in cat
-            }
-            if not book_category_names.isdisjoint(preferred_category_names):
-                recommended_books.append(book)
+    category_index = api_client.catalog.derived("category_index", CategoryIndex)
+    recommended_books = recommender.rank_books(
+        category_index,
+        [(cat_id, all_categories_map.get(cat_id)) for cat_id in preferred_category_ids]
+    )
 
     message_object = update.message or update.callback_query.message
 
@@ -173,7 +196,7 @@ async def show_recommendations_after_selection(update: Update, context: ContextT
         await message_object.reply_text(f"😔 К сожалению, по вашим {pref_names_str} предпочтениям ничего не найдено.")
         return ConversationHandler.END
 
-    context.user_data['rec_books_list'] = recommended_books
+    context.user_data['rec_books_list'] = ids_cursor(recommended_books)
     await send_or_edit_paginated_books(update, context, view_key='rec_books_list', page=0)
     return RECOMMENDATIONS_PAGINATING
 
@@ -191,7 +214,8 @@ async def recommendations_cancel_action(update: Update, context: ContextTypes.DE
 
     await show_menu(update, context)
 
-    for key in ['all_categories_map', 'selected_rec_category_ids', 'rec_books_list', 'all_books_list']:
+    for key in ['all_categories_map', 'selected_rec_category_ids', 'rec_books_list', 'all_books_list',
+                'search_books_list', 'filter_selection', 'filter_options', 'filter_books_list']:
         context.user_data.pop(key, None)
 
     return ConversationHandler.END
\ No newline at end of file
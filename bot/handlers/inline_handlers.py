@@ -0,0 +1,126 @@
+import html
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import ContextTypes
+from bot import config
+from bot.services import api_client
+from bot.services.search_index import SEARCH_RESULTS_LIMIT, SearchIndex, query_terms
+
+INLINE_RESULTS_PER_PAGE = getattr(config, "INLINE_RESULTS_PER_PAGE", 20)
+INLINE_CACHE_TIME_SECONDS = getattr(config, "INLINE_CACHE_TIME_SECONDS", 60)
+INLINE_QUERY_CACHE_SIZE = getattr(config, "INLINE_QUERY_CACHE_SIZE", 1000)
+INLINE_DESCRIPTION_LIMIT = getattr(config, "INLINE_DESCRIPTION_LIMIT", 300)
+
+Terms = Tuple[str, ...]
+
+
+def format_inline_message(book: dict) -> str:
+    # What gets posted when a result is picked. Unlike format_book_message the book's
+    # own text is escaped and the description shortened: one book with "<" in its
+    # title or a 5000-character description would make Telegram reject the whole answer.
+    description = book.get("description") or "Описание отсутствует."
+    if len(description) > INLINE_DESCRIPTION_LIMIT:
+        description = description[:INLINE_DESCRIPTION_LIMIT].rstrip() + "…"
+    categories = ", ".join(
+        category.get("name", "N/A") if isinstance(category, dict) else str(category)
+        for category in book.get("categories") or ()
+    ) or "Не указаны"
+    price_value = book.get("price")
+    price = f"{price_value} у.е." if price_value is not None else "Не указана"
+    published_date = (book.get("publishedDate") or "").split("T")[0] or "Не указана"
+    return (
+        f"📖 <b>{html.escape(str(book.get('title', 'Без названия')))}</b>\n"
+        f"✍️ Автор: {html.escape(str(book.get('author', 'Автор неизвестен')))}\n"
+        f"📝 Описание: {html.escape(description)}\n"
+        f"🏷 Категории: {html.escape(categories)}\n"
+        f"💰 Цена: {price}\n"
+        f"🌐 Язык: {html.escape(str(book.get('language', 'Не указан')))}\n"
+        f"📅 Дата публикации: {html.escape(published_date)}"
+    )
+
+
+class InlineResultCache:
+    # Derived from the catalog like SearchIndex. Inline queries arrive on every
+    # keystroke, so two things are kept per catalog version:
+    #   queries  - ranked results (and the scores of every match) per normalised query;
+    #              a query that only extends the last word of a cached one is rescored
+    #              over that query's matches instead of the whole index (unless the
+    #              cached last word was too short for all its prefix matches to count)
+    #   articles - the InlineQueryResultArticle of each book, built on first use
+
+    def __init__(self, books: List[dict]):
+        self.books = books
+        self.queries: "OrderedDict[Terms, Tuple[Dict[int, float], List[dict], bool]]" = OrderedDict()
+        self.articles: Dict[str, InlineQueryResultArticle] = {}
+
+    def apply_changes(self, changes) -> None:
+        for _, old_book, new_book in changes:
+            self.articles.pop(new_book.get("_id"), None)
+        self.queries.clear()
+
+    def _cached_prefix(self, terms: Terms) -> Optional[Tuple[Terms, Dict[int, float], List[dict], bool]]:
+        # "war pea" -> "war pea", "war pe", "war p": every match of a longer last word is
+        # also a match of its prefix, so those results are a superset of ours.
+        last_term = terms[-1]
+        for length in range(len(last_term), 0, -1):
+            key = terms[:-1] + (last_term[:length],)
+            cached = self.queries.get(key)
+            if cached is not None and (key == terms or cached[2]):
+                self.queries.move_to_end(key)
+                return (key,) + cached
+        return None
+
+    def results(self, search_index: SearchIndex, query: str) -> List[dict]:
+        terms = query_terms(query)
+        if not terms:
+            return self.books[:SEARCH_RESULTS_LIMIT]
+        cached = self._cached_prefix(terms)
+        if cached is not None and cached[0] == terms:
+            return cached[2]
+        scores = search_index.score(terms, candidates=cached[1] if cached is not None else None)
+        ranked = search_index.top(scores)
+        self.queries[terms] = (scores, ranked, search_index.expands_fully(terms[-1]))
+        while len(self.queries) > INLINE_QUERY_CACHE_SIZE:
+            self.queries.popitem(last=False)
+        return ranked
+
+    def article(self, book: dict) -> InlineQueryResultArticle:
+        book_id = book.get("_id")
+        article = self.articles.get(book_id)
+        if article is None:
+            price_value = book.get("price")
+            price = f"{price_value} тг" if price_value is not None else "Бесплатно"
+            image = book.get("image")
+            article = InlineQueryResultArticle(
+                id=str(book_id),
+                title=book.get("title", "Без названия"),
+                description=f"{book.get('author', 'Автор неизвестен')} · {price}",
+                input_message_content=InputTextMessageContent(format_inline_message(book), parse_mode="HTML"),
+                thumbnail_url=image if isinstance(image, str) and image.startswith("http") else None,
+            )
+            self.articles[book_id] = article
+        return article
+
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    inline_query = update.inline_query
+    result = await api_client.get_all_books()
+    if not result.get("success"):
+        await inline_query.answer([], cache_time=0)
+        return
+
+    search_index = api_client.catalog.derived("search_index", SearchIndex)
+    inline_results = api_client.catalog.derived("inline_results", InlineResultCache)
+    books = inline_results.results(search_index, inline_query.query)
+
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    page_end = offset + INLINE_RESULTS_PER_PAGE
+    # Results are the same for every user, so Telegram may serve them to anyone
+    # typing the same query for cache_time seconds.
+    await inline_query.answer(
+        [inline_results.article(book) for book in books[offset:page_end]],
+        cache_time=INLINE_CACHE_TIME_SECONDS,
+        is_personal=False,
+        next_offset=str(page_end) if page_end < len(books) else "",
+    )
@@ -24,6 +24,8 @@ async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/mybooks - Ваши книги (просмотр, редактирование, удаление)\n"
         "/createbook - Добавить новую книгу\n"
         "/books - Посмотреть все книги\n"
+        "/search - Поиск книг по названию, автору и описанию\n"
+        "/filter - Фильтр книг по цене, языку, типу и году\n"
         "/myrecommendations - Рекомендации для вас\n"
         "/me - Ваш профиль\n"
         "/cancel - Отменить текущее действие\n\n"
@@ -1,33 +1,134 @@
+import itertools
 import math
+from typing import Callable, Iterable, List, Optional, Tuple
 from telegram import Update, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from bot.keyboards.inline_keyboards import create_pagination_keyboard
+from bot.services import api_client
+from bot.services.facet_index import FacetIndex, Selection, bitmap_bits
+from bot.services.render_cache import renders, signature
+from bot.services.sort_orders import SORT_KEYS, SortOrders
 
 BOOKS_PER_PAGE = 5
 
+# Views keep only a small cursor in user_data instead of a private copy of the books:
+#   {"source": "catalog"}              - the whole shared catalog, in backend order
+#   {"source": "ids", "ids": [...]}    - a fixed selection of book ids (recommendations)
+#   {"source": "filter", "selection": {facet: [values]}}
+#                                      - the books matching a /filter selection, looked
+#                                        up in the shared FacetIndex on every page
+# Pages are resolved against the shared catalog cache one at a time. A cursor may also
+# carry "sort" (see set_cursor_sort); a sorted page of a selection is found by walking
+# the catalog's precomputed permutation and keeping the selected books, so nothing is
+# re-sorted or stored per user.
 
-async def send_or_edit_paginated_books(update: Update, context: ContextTypes.DEFAULT_TYPE, view_key: str, page: int):
 
-    query = update.callback_query
-    if query:
-        await query.answer()
+def catalog_cursor() -> dict:
+    return {"source": "catalog"}
 
-    book_list = context.user_data.get(view_key, [])
-    if not book_list:
-        text = "Нет книг для отображения."
-        if query:
-            await query.edit_message_text(text, reply_markup=None)
-        else:
-            await update.message.reply_text(text)
-        return
 
-    context.user_data[f'{view_key}_page'] = page
+def ids_cursor(books: List[dict]) -> dict:
+    ids = [book["_id"] for book in books if book.get("_id")]
+    return {"source": "ids", "ids": ids, "signature": signature(ids)}
+
+
+def filter_cursor(selection: Selection) -> dict:
+    selection = {facet: sorted(values) for facet, values in selection.items() if values}
+    parts = (f"{facet}={value}" for facet in sorted(selection) for value in selection[facet])
+    return {"source": "filter", "selection": selection, "signature": signature(parts)}
+
+
+def _sort_orders() -> SortOrders:
+    return api_client.catalog.derived("sort_orders", SortOrders)
+
+
+def set_cursor_sort(cursor: dict, mode: str) -> None:
+    if mode in SORT_KEYS:
+        cursor["sort"] = mode
+    else:
+        cursor.pop("sort", None)
+
+
+async def _load_catalog_page(cursor: dict, start: int, end: int) -> Tuple[List[dict], int]:
+    result = await api_client.get_all_books()
+    books = (result.get("data") or []) if result.get("success") else []
+    mode = cursor.get("sort")
+    if mode in SORT_KEYS:
+        # The permutation is built once per catalog version; a page is a slice of it.
+        return [books[position] for position in _sort_orders().order(mode)[start:end]], len(books)
+    return books[start:end], len(books)
+
+
+def _page_positions(positions: Iterable[int], keep: Callable[[int], bool], start: int, end: int) -> List[int]:
+    # The start:end slice of the positions that are kept, walking no further than needed.
+    return list(itertools.islice((position for position in positions if keep(position)), start, end))
+
+
+async def _load_ids_page(cursor: dict, start: int, end: int) -> Tuple[List[dict], int]:
+    ids = cursor.get("ids", [])
+    result = await api_client.get_all_books()
+    mode = cursor.get("sort")
+    if mode in SORT_KEYS and result.get("success"):
+        books = result.get("data") or []
+        # Sorting the selected books by their rank costs O(k log k) for k ids, whatever
+        # the catalog size; ids no longer in the catalog are left out, as unsorted.
+        positions = [position for position in map(api_client.catalog.position_of, ids) if position is not None]
+        page_positions = _sort_orders().sort_positions(positions, mode)[start:end]
+        return [books[position] for position in page_positions], len(ids)
+    page_books = [book for book in map(api_client.catalog.get_by_id, ids[start:end]) if book is not None]
+    return page_books, len(ids)
+
 
-    start_index = page * BOOKS_PER_PAGE
-    end_index = start_index + BOOKS_PER_PAGE
-    paginated_books = book_list[start_index:end_index]
+async def _load_filter_page(cursor: dict, start: int, end: int) -> Tuple[List[dict], int]:
+    result = await api_client.get_all_books()
+    books = (result.get("data") or []) if result.get("success") else []
+    bits = bitmap_bits(api_client.catalog.derived("facet_index", FacetIndex).matching(cursor.get("selection", {})))
+    mode = cursor.get("sort")
+    positions = _sort_orders().order(mode) if mode in SORT_KEYS else range(len(bits))
+    page_positions = _page_positions(positions, lambda position: position < len(bits) and bits[position] == "1",
+                                     start, end)
+    return [books[position] for position in page_positions], bits.count("1")
 
-    total_pages = math.ceil(len(book_list) / BOOKS_PER_PAGE)
+
+PAGE_LOADERS = {
+    "catalog": _load_catalog_page,
+    "ids": _load_ids_page,
+    "filter": _load_filter_page,
+}
+
+
+async def load_books_page(cursor: dict, page: int, per_page: int = BOOKS_PER_PAGE) -> Tuple[List[dict], int]:
+    loader = PAGE_LOADERS.get(cursor.get("source")) if isinstance(cursor, dict) else None
+    if loader is None:
+        return [], 0
+    start_index = page * per_page
+    return await loader(cursor, start_index, start_index + per_page)
+
+
+def _cursor_signature(cursor: dict) -> tuple:
+    if cursor.get("source") == "ids":
+        if "signature" not in cursor:
+            cursor["signature"] = signature(cursor.get("ids", []))
+        return "ids", cursor["signature"], cursor.get("sort")
+    if cursor.get("source") == "filter":
+        return "filter", cursor.get("signature"), cursor.get("sort")
+    return cursor.get("source"), cursor.get("sort")
+
+
+async def _render_page(cursor: dict, view_key: str, page: int) -> Optional[Tuple[str, InlineKeyboardMarkup]]:
+    # A page depends only on the view, the catalog version, the page number and the
+    # cursor (its ids and sort), so users looking at the same page share one render.
+    await api_client.get_all_books()
+    key = (view_key, api_client.catalog.version, page, _cursor_signature(cursor))
+    rendered = renders.get(key)
+    if rendered is not None:
+        return rendered
+
+    paginated_books, total_books = await load_books_page(cursor, page)
+    if not total_books:
+        return None
+
+    total_pages = math.ceil(total_books / BOOKS_PER_PAGE)
 
     message_parts = [f"📚 Страница {page + 1}/{total_pages}\n"]
     if not paginated_books:
@@ -43,7 +144,30 @@ async def send_or_edit_paginated_books(update: Update, context: ContextTypes.DEF
             message_parts.append(book_line)
 
     full_message = "\n".join(message_parts)
-    keyboard = create_pagination_keyboard(page, total_pages, view_key)
+    keyboard = create_pagination_keyboard(page, total_pages, view_key, sort_mode=cursor.get("sort", "default"))
+    rendered = (full_message, keyboard)
+    renders.put(key, rendered)
+    return rendered
+
+
+async def send_or_edit_paginated_books(update: Update, context: ContextTypes.DEFAULT_TYPE, view_key: str, page: int):
+
+    query = update.callback_query
+    if query:
+        await query.answer()
+
+    cursor = context.user_data.get(view_key)
+    rendered = await _render_page(cursor, view_key, page) if isinstance(cursor, dict) else None
+    if rendered is None:
+        text = "Нет книг для отображения."
+        if query:
+            await query.edit_message_text(text, reply_markup=None)
+        else:
+            await update.message.reply_text(text)
+        return
+
+    context.user_data[f'{view_key}_page'] = page
+    full_message, keyboard = rendered
 
     if query:
         try:
@@ -52,4 +176,4 @@ async def send_or_edit_paginated_books(update: Update, context: ContextTypes.DEF
             if "Message is not modified" not in str(e):
                 print(f"Error editing message: {e}")
     else:
-        await update.message.reply_text(full_message, parse_mode="HTML", reply_markup=keyboard)
\ No newline at end of file
+        await update.message.reply_text(full_message, parse_mode="HTML", reply_markup=keyboard)
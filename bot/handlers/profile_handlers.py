@@ -1,11 +1,12 @@
 from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.services import api_client
+from bot.services.image_processing import select_photo_size
 from bot.states import session_manager
 from bot.utils.helpers import (
     check_user_logged_in,
     handle_api_error,
-    encode_image_to_base64
+    reply_photo_cached
 )
 from bot.keyboards import reply_keyboards
 from .conversation_states import PROFILE_WAITING_FOR_PIC
@@ -17,7 +18,13 @@ async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return ConversationHandler.END
 
     cookies = session_manager.get_cookies(user_id)
-    result = api_client.check_auth_status(cookies)
+    cached_profile = session_manager.get_cached_profile(user_id)
+    if cached_profile:
+        result = {"success": True, "data": cached_profile}
+    else:
+        result = await api_client.check_auth_status(cookies)
+        if result.get("success") and result.get("data"):
+            session_manager.set_cached_profile(user_id, result["data"])
 
     if result.get("success"):
         user_data = result.get("data")
@@ -34,8 +41,9 @@ async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
         if profile_pic_url:
             try:
-                await update.message.reply_photo(
-                    photo=profile_pic_url,
+                await reply_photo_cached(
+                    update.message,
+                    profile_pic_url,
                     caption=text,
                     parse_mode="HTML",
                     reply_markup=reply_keyboards.profile_action_markup
@@ -53,11 +61,16 @@ async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 reply_markup=reply_keyboards.profile_action_markup
             )
         return PROFILE_WAITING_FOR_PIC
-    else:
+    elif result.get("status_code") in (401, 403):
         await handle_api_error(update, result, "⚠️ Сессия истекла или недействительна. Войдите снова.")
         session_manager.clear_entire_session(user_id)
         await show_menu(update, context)
         return ConversationHandler.END
+    else:
+        # The backend being down or slow says nothing about the session: keep the user logged in.
+        await handle_api_error(update, result, "⚠️ Не удалось получить данные профиля. Попробуйте позже.")
+        await show_menu(update, context)
+        return ConversationHandler.END
 
 
 async def request_new_profile_pic_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -84,14 +97,11 @@ async def update_profile_picture_handler(update: Update, context: ContextTypes.D
 
 
     cookies = session_manager.get_cookies(user_id)
-    photo_file = await update.message.photo[-1].get_file()
-    photo_bytes = await photo_file.download_as_bytearray()
-    image_data_url = encode_image_to_base64(photo_bytes, mime_type="image/jpeg")
+    photo_file = await select_photo_size(update.message.photo).get_file()
 
     await update.message.reply_text("⏳ Обновляю ваше фото профиля...", reply_markup=ReplyKeyboardRemove())
-    profile_update_payload = {"profilePic": image_data_url}
-
-    result = api_client.update_user_profile(cookies, profile_update_payload)
+    result = await api_client.update_profile_picture(cookies, photo_file.file_path)
+    session_manager.invalidate_profile(user_id)
 
     if result.get("success"):
         await update.message.reply_text("✅ Фото профиля успешно обновлено!")
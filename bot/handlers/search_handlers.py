@@ -0,0 +1,44 @@
+from telegram import Update, ReplyKeyboardRemove
+from telegram.ext import ContextTypes, ConversationHandler
+from bot.services import api_client
+from bot.services.search_index import SearchIndex
+from bot.utils.helpers import handle_api_error
+from .conversation_states import SEARCH_WAITING_QUERY, SEARCH_PAGINATING
+from .pagination_helpers import send_or_edit_paginated_books, ids_cursor
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    query_text = " ".join(context.args) if context.args else ""
+    if not query_text:
+        await update.message.reply_text(
+            "🔎 Введите название, автора или слова из описания книги:",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return SEARCH_WAITING_QUERY
+    return await run_search(update, context, query_text)
+
+
+async def search_query_received(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    return await run_search(update, context, update.message.text)
+
+
+async def run_search(update: Update, context: ContextTypes.DEFAULT_TYPE, query_text: str) -> int:
+    # The index is built once per catalog version and shared by all users, so a query
+    # is answered from memory without asking the backend.
+    result = await api_client.get_all_books()
+    if not result.get("success"):
+        await handle_api_error(update, result, "⚠️ Ошибка при получении списка книг.")
+        return ConversationHandler.END
+
+    search_index = api_client.catalog.derived("search_index", SearchIndex)
+    found_books = search_index.search(query_text)
+
+    if not found_books:
+        await update.message.reply_text(
+            f"😔 По запросу «{query_text}» ничего не найдено. Попробуйте другой запрос или /cancel."
+        )
+        return SEARCH_WAITING_QUERY
+
+    context.user_data['search_books_list'] = ids_cursor(found_books)
+    await send_or_edit_paginated_books(update, context, view_key='search_books_list', page=0)
+    return SEARCH_PAGINATING
@@ -1,5 +1,6 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set, Tuple
+from bot.services.sort_orders import next_sort_mode
 
 
 def create_genre_selection_keyboard(all_categories: Dict[str, str], selected_ids: Set[str]) -> InlineKeyboardMarkup:
@@ -12,7 +13,23 @@ def create_genre_selection_keyboard(all_categories: Dict[str, str], selected_ids
     return InlineKeyboardMarkup(keyboard_buttons)
 
 
-def create_pagination_keyboard(page: int, total_pages: int, view_key: str) -> InlineKeyboardMarkup:
+SORT_MODE_LABELS = {
+    "default": "по умолчанию",
+    "cheap": "сначала дешёвые",
+    "expensive": "сначала дорогие",
+    "newest": "сначала новые",
+    "title": "по названию А–Я",
+}
+
+
+def create_sort_button(view_key: str, sort_mode: str) -> InlineKeyboardButton:
+    # One button that cycles through the sort modes.
+    return InlineKeyboardButton(f"↕️ Сортировка: {SORT_MODE_LABELS.get(sort_mode, sort_mode)}",
+                                callback_data=f"sort_{view_key}_{next_sort_mode(sort_mode)}")
+
+
+def create_pagination_keyboard(page: int, total_pages: int, view_key: str,
+                               sort_mode: Optional[str] = None) -> InlineKeyboardMarkup:
     buttons = []
     row = []
 
@@ -25,6 +42,58 @@ def create_pagination_keyboard(page: int, total_pages: int, view_key: str) -> In
         row.append(InlineKeyboardButton("Вперёд ➡️", callback_data=f"paginate_{view_key}_next_{page + 1}"))
 
     buttons.append(row)
+    if sort_mode is not None:
+        buttons.append([create_sort_button(view_key, sort_mode)])
     buttons.append([InlineKeyboardButton("❌ Закрыть", callback_data=f"paginate_{view_key}_close_0")])
 
-    return InlineKeyboardMarkup(buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(buttons)
+
+FILTER_FACET_TITLES = {
+    "price": "💰 Цена",
+    "language": "🌐 Язык",
+    "type": "📦 Тип",
+    "date": "📅 Год издания",
+}
+
+
+def _filter_value_label(facet: str, value: str) -> str:
+    if facet == "price" and value == "free":
+        return "Бесплатно"
+    if facet in ("price", "date"):
+        lower, _, upper = value.partition("-")
+        if value.endswith("+"):
+            return f"от {value[:-1]}"
+        if not lower or lower == "0":
+            return f"до {upper}"
+        if facet == "date":
+            # Year buckets exclude their upper bound: 2000-2010 is 2000–2009.
+            return f"{lower}–{int(upper) - 1}"
+        return f"{lower}–{upper}"
+    return value
+
+
+def create_filter_keyboard(options: Dict[str, List[Tuple[str, int]]], selected: Dict[str, Set[str]],
+                           total: int) -> InlineKeyboardMarkup:
+    # options maps each facet to its (value, count) pairs in display order; the
+    # callback carries the value's index in that list to stay within Telegram's
+    # 64-byte callback_data limit.
+    keyboard_buttons = []
+    for facet, values in options.items():
+        if not values:
+            continue
+        keyboard_buttons.append([InlineKeyboardButton(f"— {FILTER_FACET_TITLES.get(facet, facet)} —",
+                                                      callback_data="filter_ignore")])
+        row = []
+        for index, (value, count) in enumerate(values):
+            prefix = "✅ " if value in selected.get(facet, ()) else ""
+            row.append(InlineKeyboardButton(f"{prefix}{_filter_value_label(facet, value)} ({count})",
+                                            callback_data=f"filter_toggle_{facet}_{index}"))
+            if len(row) == 2:
+                keyboard_buttons.append(row)
+                row = []
+        if row:
+            keyboard_buttons.append(row)
+    keyboard_buttons.append([InlineKeyboardButton(f"🔍 Показать ({total})", callback_data="filter_show")])
+    keyboard_buttons.append([InlineKeyboardButton("♻️ Сбросить", callback_data="filter_reset"),
+                             InlineKeyboardButton("❌ Отмена", callback_data="filter_cancel")])
+    return InlineKeyboardMarkup(keyboard_buttons)
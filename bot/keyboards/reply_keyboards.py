@@ -2,6 +2,7 @@ from telegram import ReplyKeyboardMarkup, KeyboardButton
 
 GUEST_MENU_LAYOUT = [
     [KeyboardButton("📚 Все книги"), KeyboardButton("💡 Рекомендации книг")],
+    [KeyboardButton("🔎 Поиск книг"), KeyboardButton("🧮 Фильтр книг")],
     [KeyboardButton("🔓 Войти"), KeyboardButton("📝 Регистрация")],
 ]
 guest_menu_markup = ReplyKeyboardMarkup(GUEST_MENU_LAYOUT, resize_keyboard=True, one_time_keyboard=False)
@@ -9,6 +10,7 @@ guest_menu_markup = ReplyKeyboardMarkup(GUEST_MENU_LAYOUT, resize_keyboard=True,
 LOGGED_IN_MENU_LAYOUT = [
     [KeyboardButton("📖 Мои книги"), KeyboardButton("➕ Добавить новую книгу")],
     [KeyboardButton("📚 Все книги"), KeyboardButton("💡 Мои рекомендации")],
+    [KeyboardButton("🔎 Поиск книг"), KeyboardButton("🧮 Фильтр книг")],
     [KeyboardButton("👤 Мой профиль"), KeyboardButton("🚪 Выйти")],
 ]
 logged_in_menu_markup = ReplyKeyboardMarkup(LOGGED_IN_MENU_LAYOUT, resize_keyboard=True, one_time_keyboard=False)
@@ -31,7 +33,7 @@ CREATE_BOOK_CANCEL_LAYOUT = [
 create_book_cancel_markup = ReplyKeyboardMarkup(CREATE_BOOK_CANCEL_LAYOUT, resize_keyboard=True, one_time_keyboard=True)
 
 POSSIBLE_MAIN_MENU_COMMANDS = {
-    "📚 Все книги", "💡 Рекомендации книг", "🔓 Войти", "📝 Регистрация",
+    "📚 Все книги", "💡 Рекомендации книг", "🔎 Поиск книг", "🧮 Фильтр книг", "🔓 Войти", "📝 Регистрация",
     "📖 Мои книги", "➕ Добавить новую книгу", "💡 Мои рекомендации", "👤 Мой профиль", "🚪 Выйти"
 }
 
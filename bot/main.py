@@ -1,13 +1,22 @@
+import asyncio
+
 from telegram.ext import (
     ApplicationBuilder, MessageHandler, CommandHandler, filters,
-    ConversationHandler, CallbackQueryHandler
+    ConversationHandler, CallbackQueryHandler, InlineQueryHandler
 )
+from bot import config
 from bot.config import TELEGRAM_TOKEN
+from bot.services import api_client, image_processing
+from bot.services.render_cache import renders
+from bot.states import session_manager
+from bot.states.persistence import SqlitePersistence
+from bot.utils.update_processor import PerUserUpdateProcessor
 
 from bot.handlers.menu import show_menu as show_main_menu_command
+from bot.keyboards.reply_keyboards import POSSIBLE_MAIN_MENU_COMMANDS
 
 from bot.handlers.book_handlers import (
-    my_books_command, choose_action_handler, choose_book_index_handler,
+    my_books_command, my_books_sort_callback, choose_action_handler, choose_book_index_handler,
     confirm_delete_handler,
     universal_edit_field_handler,
     skip_edit_field_handler,
@@ -17,7 +26,9 @@ from bot.handlers.book_handlers import (
     categories_received_handler, type_received_handler, price_received_handler,
     image_received_handler, cancel_create_book_handler
 )
-from bot.handlers import general_handlers, auth_handlers, profile_handlers
+from bot.handlers import (
+    general_handlers, auth_handlers, profile_handlers, search_handlers, inline_handlers, filter_handlers
+)
 
 from bot.handlers.general_handlers import book_paginator_callback
 
@@ -29,7 +40,9 @@ from bot.handlers.conversation_states import (
     CREATE_BOOK_IMAGE,
     PROFILE_WAITING_FOR_PIC,
     RECOMMENDATIONS_SELECTING_GENRES,
-    ALL_BOOKS_PAGINATING, RECOMMENDATIONS_PAGINATING
+    ALL_BOOKS_PAGINATING, RECOMMENDATIONS_PAGINATING,
+    SEARCH_WAITING_QUERY, SEARCH_PAGINATING,
+    FILTER_SELECTING, FILTER_PAGINATING
 )
 
 from bot.handlers.conversation_states import (
@@ -40,13 +53,91 @@ from bot.handlers.conversation_states import (
 )
 
 
-def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+PERSISTENCE_UPDATE_INTERVAL_SECONDS = getattr(config, "PERSISTENCE_UPDATE_INTERVAL_SECONDS", 5)
+MAX_CONCURRENT_UPDATES = getattr(config, "MAX_CONCURRENT_UPDATES", 64)
+# How often request and render cache counters are printed while running (0 = only on shutdown).
+STATS_LOG_INTERVAL_SECONDS = getattr(config, "STATS_LOG_INTERVAL_SECONDS", 3600)
+# Users without an update for this long are dropped from memory (their stored data stays
+# and is loaded again on their next update); checked every USER_DATA_SWEEP_SECONDS.
+USER_DATA_IDLE_SECONDS = getattr(config, "USER_DATA_IDLE_SECONDS", 3600)
+USER_DATA_SWEEP_SECONDS = getattr(config, "USER_DATA_SWEEP_SECONDS", 300)
+
+# "polling" or "webhook". Webhook mode needs python-telegram-bot[webhooks] and a public
+# WEBHOOK_URL (for example the load balancer address) that forwards to WEBHOOK_LISTEN:WEBHOOK_PORT.
+BOT_MODE = getattr(config, "BOT_MODE", "polling")
+WEBHOOK_LISTEN = getattr(config, "WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = getattr(config, "WEBHOOK_PORT", 8443)
+WEBHOOK_PATH = getattr(config, "WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = getattr(config, "WEBHOOK_URL", None)
+WEBHOOK_SECRET_TOKEN = getattr(config, "WEBHOOK_SECRET_TOKEN", None)
+# Bot API server to talk to instead of api.telegram.org, e.g. a local Bot API server or
+# the stand-in of scripts/webhook_standin.py.
+TELEGRAM_API_URL = getattr(config, "TELEGRAM_API_URL", None)
+
+
+_stats_task = None
+_sweep_task = None
+
+
+def log_stats():
+    print(f"Backend request stats: {api_client.get_request_stats()}")
+    print(f"Render cache stats: {renders.get_stats()}")
+
+
+async def _log_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_LOG_INTERVAL_SECONDS)
+        log_stats()
+
+
+async def _evict_idle_users_periodically(app):
+    while True:
+        await asyncio.sleep(USER_DATA_SWEEP_SECONDS)
+        for user_id in app.persistence.take_idle_users(USER_DATA_IDLE_SECONDS):
+            app.drop_user_data(user_id)
+
+
+async def on_startup(app):
+    global _stats_task, _sweep_task
+    await api_client.init_session()
+    if STATS_LOG_INTERVAL_SECONDS:
+        _stats_task = asyncio.create_task(_log_stats_periodically())
+    if USER_DATA_IDLE_SECONDS:
+        _sweep_task = asyncio.create_task(_evict_idle_users_periodically(app))
+
+
+async def on_shutdown(app):
+    for task in (_stats_task, _sweep_task):
+        if task is not None:
+            task.cancel()
+    log_stats()
+    session_manager.close()
+    image_processing.shutdown_pool()
+    await api_client.close_session()
+
+
+def build_application():
+    builder = ApplicationBuilder().token(TELEGRAM_TOKEN)
+    if TELEGRAM_API_URL:
+        api_url = TELEGRAM_API_URL.rstrip('/')
+        builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+    app = (
+        builder
+        .persistence(SqlitePersistence(session_manager.SESSION_DB_PATH,
+                                       update_interval=PERSISTENCE_UPDATE_INTERVAL_SECONDS))
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    session_manager.bind_user_data(app.user_data)
 
     CANCEL_BOOK_CREATION_TEXT = "❌ Отменить создание книги"
     CANCEL_BOOK_CREATION_REGEX = f"^{CANCEL_BOOK_CREATION_TEXT}$"
 
     login_conv = ConversationHandler(
+        name="login_conv",
+        persistent=True,
         entry_points=[MessageHandler(filters.Regex(f"^🔓 Войти$"), auth_handlers.start_login_command),
                       CommandHandler("login", auth_handlers.start_login_command)],
         states={
@@ -56,6 +147,8 @@ def main():
         fallbacks=[CommandHandler("cancel", auth_handlers.cancel_login)],
     )
     register_conv = ConversationHandler(
+        name="register_conv",
+        persistent=True,
         entry_points=[MessageHandler(filters.Regex(f"^📝 Регистрация$"), auth_handlers.start_register_command),
                       CommandHandler("register", auth_handlers.start_register_command)],
         states={
@@ -76,6 +169,8 @@ def main():
         fallbacks=[CommandHandler("cancel", auth_handlers.cancel_register)],
     )
     create_book_conv = ConversationHandler(
+        name="create_book_conv",
+        persistent=True,
         entry_points=[MessageHandler(filters.Regex(f"^➕ Добавить новую книгу$"), start_create_book_command),
                       CommandHandler("createbook", start_create_book_command)],
         states={
@@ -111,12 +206,15 @@ def main():
         ],
     )
     my_books_conv = ConversationHandler(
+        name="my_books_conv",
+        persistent=True,
         entry_points=[
             MessageHandler(filters.Regex(f"^📖 Мои книги$"), my_books_command),
             CommandHandler("mybooks", my_books_command)],
         states={
             MY_BOOKS_CHOOSE_ACTION: [
-                MessageHandler(filters.Regex("^(✏️ Редактировать|🗑 Удалить|❌ Отмена)$"), choose_action_handler)],
+                MessageHandler(filters.Regex("^(✏️ Редактировать|🗑 Удалить|❌ Отмена)$"), choose_action_handler),
+                CallbackQueryHandler(my_books_sort_callback, pattern=r"^sort_my_books_cache_")],
             MY_BOOKS_CHOOSE_BOOK_INDEX: [MessageHandler(filters.TEXT & ~filters.COMMAND, choose_book_index_handler)],
             MY_BOOKS_CONFIRM_DELETE: [MessageHandler(filters.Regex("^(да|нет|yes|no)$"), confirm_delete_handler)],
             MY_BOOKS_EDIT_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, universal_edit_field_handler),
@@ -142,6 +240,8 @@ def main():
                    MessageHandler(filters.Regex("^❌ Отмена$"), cancel_my_books_action)],
     )
     profile_conv = ConversationHandler(
+        name="profile_conv",
+        persistent=True,
         entry_points=[MessageHandler(filters.Regex(f"^👤 Мой профиль$"), profile_handlers.profile_command),
                       CommandHandler("me", profile_handlers.profile_command)],
         states={
@@ -156,6 +256,8 @@ def main():
     )
 
     recommendations_conv = ConversationHandler(
+        name="recommendations_conv",
+        persistent=True,
         entry_points=[
             MessageHandler(filters.Regex(f"^💡 (Рекомендации книг|Мои рекомендации)$"),
                            general_handlers.recommendations_start_command),
@@ -166,7 +268,8 @@ def main():
                 CallbackQueryHandler(general_handlers.handle_genre_selection_callback, pattern="^rec_genre_")
             ],
             RECOMMENDATIONS_PAGINATING: [
-                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_rec_books_list_(next|prev|ignore)")
+                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_rec_books_list_(next|prev|ignore)"),
+                CallbackQueryHandler(general_handlers.book_sort_callback, pattern=r"^sort_rec_books_list_")
             ]
         },
         fallbacks=[
@@ -178,13 +281,16 @@ def main():
     )
 
     all_books_conv = ConversationHandler(
+        name="all_books_conv",
+        persistent=True,
         entry_points=[
             MessageHandler(filters.Regex(f"^📚 Все книги$"), general_handlers.list_all_books_command),
             CommandHandler("books", general_handlers.list_all_books_command)
         ],
         states={
             ALL_BOOKS_PAGINATING: [
-                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_all_books_list_(next|prev|ignore)")
+                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_all_books_list_(next|prev|ignore)"),
+                CallbackQueryHandler(general_handlers.book_sort_callback, pattern=r"^sort_all_books_list_")
             ]
         },
         fallbacks=[
@@ -194,6 +300,56 @@ def main():
         ]
     )
 
+    # Any other text is a search query, but main menu buttons must still reach their own
+    # handlers (filter_conv and "🚪 Выйти" are registered after search_conv).
+    SEARCH_QUERY_FILTER = filters.TEXT & ~filters.COMMAND & ~filters.Text(list(POSSIBLE_MAIN_MENU_COMMANDS))
+    search_conv = ConversationHandler(
+        name="search_conv",
+        persistent=True,
+        entry_points=[
+            MessageHandler(filters.Regex(f"^🔎 Поиск книг$"), search_handlers.search_command),
+            CommandHandler("search", search_handlers.search_command)
+        ],
+        states={
+            SEARCH_WAITING_QUERY: [
+                MessageHandler(SEARCH_QUERY_FILTER, search_handlers.search_query_received)
+            ],
+            SEARCH_PAGINATING: [
+                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_search_books_list_(next|prev|ignore)"),
+                CallbackQueryHandler(general_handlers.book_sort_callback, pattern=r"^sort_search_books_list_"),
+                MessageHandler(SEARCH_QUERY_FILTER, search_handlers.search_query_received)
+            ]
+        },
+        fallbacks=[
+            CommandHandler("cancel", general_handlers.recommendations_cancel_action),
+            CallbackQueryHandler(general_handlers.recommendations_cancel_action,
+                                 pattern=r"^paginate_search_books_list_close")
+        ]
+    )
+
+    filter_conv = ConversationHandler(
+        name="filter_conv",
+        persistent=True,
+        entry_points=[
+            MessageHandler(filters.Regex(f"^🧮 Фильтр книг$"), filter_handlers.filter_start_command),
+            CommandHandler("filter", filter_handlers.filter_start_command)
+        ],
+        states={
+            FILTER_SELECTING: [
+                CallbackQueryHandler(filter_handlers.filter_selection_callback, pattern="^filter_")
+            ],
+            FILTER_PAGINATING: [
+                CallbackQueryHandler(book_paginator_callback, pattern=r"^paginate_filter_books_list_(next|prev|ignore)"),
+                CallbackQueryHandler(general_handlers.book_sort_callback, pattern=r"^sort_filter_books_list_")
+            ]
+        },
+        fallbacks=[
+            CommandHandler("cancel", general_handlers.recommendations_cancel_action),
+            CallbackQueryHandler(general_handlers.recommendations_cancel_action,
+                                 pattern=r"^paginate_filter_books_list_close")
+        ]
+    )
+
     app.add_handler(login_conv)
     app.add_handler(register_conv)
     app.add_handler(create_book_conv)
@@ -201,14 +357,36 @@ def main():
     app.add_handler(profile_conv)
     app.add_handler(recommendations_conv)
     app.add_handler(all_books_conv)
+    app.add_handler(search_conv)
+    app.add_handler(filter_conv)
 
     app.add_handler(MessageHandler(filters.Regex(f"^🚪 Выйти$"), auth_handlers.logout_command))
     app.add_handler(CommandHandler("logout", auth_handlers.logout_command))
     app.add_handler(CommandHandler("start", show_main_menu_command))
     app.add_handler(CommandHandler("menu", show_main_menu_command))
+    # Inline mode must also be enabled for the bot in @BotFather (/setinline).
+    app.add_handler(InlineQueryHandler(inline_handlers.inline_query_handler))
+
+    return app
+
+
+def main():
+    app = build_application()
 
-    print("Бот запущен и принимает сообщения...")
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL must be set in bot.config when BOT_MODE is 'webhook'")
+        print(f"Бот запущен в режиме webhook на {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+        )
+    else:
+        print("Бот запущен и принимает сообщения...")
+        app.run_polling()
 
 
 if __name__ == "__main__":
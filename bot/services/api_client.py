@@ -1,47 +1,377 @@
-import requests
+import asyncio
+import json
+import random
+import re
+from collections import OrderedDict
+import aiohttp
+from aiohttp.payload import AsyncIterablePayload
+from bot import config
 from bot.config import BACKEND_URL
-from typing import Optional, Dict, Any, List
+from bot.services import image_processing
+from bot.services.catalog_cache import CatalogCache
+from bot.services.catalog_records import BookRecord
+from bot.services.circuit_breaker import CircuitBreaker
+from bot.utils.helpers import encode_image_to_base64
+from typing import AsyncIterator, Awaitable, Optional, Dict, Any, List, Tuple
 
-def _make_request(method: str, endpoint: str, cookies: Optional[Dict] = None, json_data: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
-    url = f"{BACKEND_URL}{endpoint}"
+HTTP_POOL_SIZE = getattr(config, "HTTP_POOL_SIZE", 100)
+HTTP_KEEPALIVE_SECONDS = getattr(config, "HTTP_KEEPALIVE_SECONDS", 30)
+HTTP_CONNECT_TIMEOUT_SECONDS = getattr(config, "HTTP_CONNECT_TIMEOUT_SECONDS", 5)
+HTTP_READ_TIMEOUT_SECONDS = getattr(config, "HTTP_READ_TIMEOUT_SECONDS", 20)
+HTTP_GET_RETRIES = getattr(config, "HTTP_GET_RETRIES", 2)
+HTTP_RETRY_BASE_DELAY_SECONDS = getattr(config, "HTTP_RETRY_BASE_DELAY_SECONDS", 0.2)
+HTTP_RETRY_MAX_DELAY_SECONDS = getattr(config, "HTTP_RETRY_MAX_DELAY_SECONDS", 2)
+BREAKER_FAILURE_THRESHOLD = getattr(config, "BREAKER_FAILURE_THRESHOLD", 5)
+BREAKER_RESET_SECONDS = getattr(config, "BREAKER_RESET_SECONDS", 30)
+CONDITIONAL_CACHE_SIZE = getattr(config, "CONDITIONAL_CACHE_SIZE", 256)
+CATEGORIES_TTL_SECONDS = getattr(config, "CATEGORIES_TTL_SECONDS", 300)
+# "full" reloads /api/books on every refresh; "incremental" asks only for books changed
+# since the newest updatedAt seen (?updatedSince=...) and does a full reload every
+# CATALOG_FULL_SYNC_EVERY refreshes.
+CATALOG_SYNC_MODE = getattr(config, "CATALOG_SYNC_MODE", "full")
+CATALOG_FULL_SYNC_EVERY = getattr(config, "CATALOG_FULL_SYNC_EVERY", 20)
+CATALOG_TTL_SECONDS = getattr(config, "CATALOG_TTL_SECONDS", 60)
+CATALOG_MAX_STALE_SECONDS = getattr(config, "CATALOG_MAX_STALE_SECONDS", 600)
+# "multipart" streams images straight from Telegram to the backend as a file part;
+# "data_url" keeps the original JSON body with a base64 data URL for backends that need it.
+IMAGE_UPLOAD_MODE = getattr(config, "IMAGE_UPLOAD_MODE", "data_url")
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Longer than a single request may take, so the fan-out timeout only cuts off calls the
+# HTTP timeouts would not have ended anyway.
+FANOUT_CALL_TIMEOUT_SECONDS = getattr(config, "FANOUT_CALL_TIMEOUT_SECONDS",
+                                      HTTP_CONNECT_TIMEOUT_SECONDS + HTTP_READ_TIMEOUT_SECONDS + 5)
+
+# One pooled session for the whole process. The cookie jar is a dummy one so that
+# cookies set by the backend never leak between users; each request carries the
+# caller's cookies explicitly instead.
+_session: Optional[aiohttp.ClientSession] = None
+
+
+async def init_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=HTTP_KEEPALIVE_SECONDS)
+        timeout = aiohttp.ClientTimeout(total=None, connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+                                        sock_read=HTTP_READ_TIMEOUT_SECONDS)
+        _session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(), timeout=timeout)
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    if _session is None or _session.closed:
+        return await init_session()
+    return _session
+
+
+async def _error_message(response: aiohttp.ClientResponse, default: str) -> str:
+    text = await response.text()
     try:
-        response = requests.request(method, url, json=json_data, cookies=cookies, params=params)
-        response.raise_for_status()
-        if response.status_code == 204:
-             return {"success": True, "data": None}
-        return {"success": True, "data": response.json()}
-    except requests.exceptions.HTTPError as http_err:
-        error_message = f"HTTP error occurred: {http_err}"
+        error_details = await response.json(content_type=None)
+        if isinstance(error_details, dict):
+            return error_details.get("message", text)
+    except ValueError:
+        pass
+    return text if text else default
+
+
+# Shared by every call to the backend: once it keeps failing, handlers fail fast (and
+# the catalog falls back to its cached copy) instead of each waiting out the timeouts.
+backend_breaker = CircuitBreaker(failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS)
+
+_RETRYABLE_STATUSES = {502, 503, 504}
+
+
+def _retry_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter.
+    return random.uniform(0, min(HTTP_RETRY_MAX_DELAY_SECONDS, HTTP_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+
+# Validators (ETag / Last-Modified) and bodies of conditional GETs, keyed by endpoint
+# and params. Cookies are deliberately not part of the key: a 304 is the backend's
+# statement that the caller's representation matches the validator we sent.
+# Callers that keep their own copy (the catalog) pass keep_body=False, so only the
+# validators are stored and a 304 comes back with data=None.
+_conditional_cache: "OrderedDict[Tuple, Tuple[Optional[str], Optional[str], Any]]" = OrderedDict()
+
+
+def _conditional_headers(conditional_key: Optional[Tuple]) -> Dict[str, str]:
+    cached = _conditional_cache.get(conditional_key) if conditional_key else None
+    if not cached:
+        return {}
+    etag, last_modified, _ = cached
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def _remember_validators(conditional_key: Tuple, response: aiohttp.ClientResponse, payload: Any) -> None:
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        _conditional_cache.pop(conditional_key, None)
+        return
+    _conditional_cache[conditional_key] = (etag, last_modified, payload)
+    _conditional_cache.move_to_end(conditional_key)
+    while len(_conditional_cache) > CONDITIONAL_CACHE_SIZE:
+        _conditional_cache.popitem(last=False)
+
+
+async def _send_request(method: str, url: str, cookies: Optional[Dict], json_data: Optional[Dict],
+                        params: Optional[Dict], data: Any,
+                        conditional_key: Optional[Tuple] = None, keep_body: bool = True) -> Tuple[Dict[str, Any], bool]:
+    # Returns the result dict and whether the failure (if any) is a transient backend
+    # problem worth retrying and counting against the circuit breaker.
+    try:
+        session = await _get_session()
+        headers = _conditional_headers(conditional_key)
+        async with session.request(method, url, json=json_data, data=data, params=params, cookies=cookies,
+                                   headers=headers) as response:
+            if response.status >= 400:
+                error_message = await _error_message(response, f"HTTP error occurred: {response.status}")
+                result = {"success": False, "error": error_message, "status_code": response.status}
+                return result, response.status >= 500
+            if response.status == 304 and conditional_key in _conditional_cache:
+                _conditional_cache.move_to_end(conditional_key)
+                return {"success": True, "data": _conditional_cache[conditional_key][2], "not_modified": True}, False
+            if response.status == 204:
+                return {"success": True, "data": None}, False
+            payload = await response.json(content_type=None)
+            if conditional_key:
+                _remember_validators(conditional_key, response, payload if keep_body else None)
+            return {"success": True, "data": payload}, False
+    except asyncio.TimeoutError:
+        return {"success": False, "error": "Request exception: backend did not respond in time"}, True
+    except aiohttp.ClientError as req_err:
+        return {"success": False, "error": f"Request exception: {req_err}"}, True
+    except Exception as e:
+        return {"success": False, "error": f"An unexpected error occurred: {str(e)}"}, False
+
+
+async def _perform_request(method: str, endpoint: str, cookies: Optional[Dict], json_data: Optional[Dict],
+                           params: Optional[Dict], data: Any, conditional: bool = False,
+                           keep_body: bool = True, download: Optional["_FileDownload"] = None) -> Dict[str, Any]:
+    url = f"{BACKEND_URL}{endpoint}"
+    conditional_key = (endpoint, tuple(sorted((params or {}).items()))) if conditional and method == "GET" else None
+    # Only idempotent GETs are retried; a repeated POST could create a book twice.
+    attempts = 1 + (HTTP_GET_RETRIES if method == "GET" else 0)
+    result: Dict[str, Any] = {}
+    for attempt in range(attempts):
+        if not backend_breaker.allow():
+            if attempt:
+                return result
+            return {"success": False, "error": "Backend temporarily unavailable (circuit open)", "circuit_open": True}
+        _count_request(method, endpoint, "sent")
         try:
-            error_details = http_err.response.json()
-            error_message = error_details.get("message", str(http_err.response.text))
-        except ValueError:
-            error_message = str(http_err.response.text if http_err.response.text else http_err)
-        return {"success": False, "error": error_message, "status_code": http_err.response.status_code if http_err.response else None}
-    except requests.exceptions.RequestException as req_err:
-        return {"success": False, "error": f"Request exception: {req_err}"}
+            result, transient = await _send_request(method, url, cookies, json_data, params, data, conditional_key,
+                                                    keep_body)
+        except BaseException:
+            # Cancelled mid-call (CancelledError is not an Exception). That says nothing
+            # about the backend, but a half-open breaker must not keep its trial slot for good.
+            backend_breaker.release_trial()
+            raise
+        if download is not None and download.failed:
+            backend_breaker.release_trial()
+            return dict(_DOWNLOAD_FAILED)
+        if not transient:
+            backend_breaker.record_success()
+            return result
+        backend_breaker.record_failure()
+        if attempt + 1 < attempts and (result.get("status_code") in _RETRYABLE_STATUSES or "status_code" not in result):
+            await asyncio.sleep(_retry_delay(attempt))
+        else:
+            return result
+    return result
+
+
+# Identical GETs that are already in flight (same endpoint, params and cookies) are
+# merged into one backend call whose result every caller shares.
+_inflight_gets: Dict[Tuple, asyncio.Future] = {}
+_request_stats = {"get_requests": 0, "coalesced_gets": 0}
+# Per "METHOD /endpoint": calls made by handlers, calls merged into one already in
+# flight, and HTTP requests actually sent to the backend (retries included).
+_endpoint_stats: Dict[str, Dict[str, int]] = {}
+_OBJECT_ID_RE = re.compile(r"/[0-9a-fA-F]{24}(?=/|$)")
+
+
+def _count_request(method: str, endpoint: str, counter: str) -> None:
+    # Book and user ids are folded into ":id", so the table stays one row per endpoint.
+    name = f"{method} {_OBJECT_ID_RE.sub('/:id', endpoint)}"
+    counters = _endpoint_stats.setdefault(name, {"calls": 0, "coalesced": 0, "sent": 0})
+    counters[counter] += 1
+
+
+def _request_key(method: str, endpoint: str, cookies: Optional[Dict], params: Optional[Dict]) -> Tuple:
+    return (
+        method,
+        endpoint,
+        tuple(sorted((params or {}).items())),
+        tuple(sorted((cookies or {}).items())),
+    )
+
+
+def get_request_stats() -> Dict[str, Any]:
+    stats = dict(_request_stats)
+    stats["coalescing_ratio"] = stats["coalesced_gets"] / stats["get_requests"] if stats["get_requests"] else 0.0
+    stats["inflight_gets"] = len(_inflight_gets)
+    stats["endpoints"] = {name: dict(counters) for name, counters in sorted(_endpoint_stats.items())}
+    return stats
+
+
+async def _make_request(method: str, endpoint: str, cookies: Optional[Dict] = None, json_data: Optional[Dict] = None, params: Optional[Dict] = None, data: Any = None, conditional: bool = False, keep_body: bool = True, download: Optional["_FileDownload"] = None) -> Dict[str, Any]:
+    # conditional=True revalidates a previously seen body with If-None-Match /
+    # If-Modified-Since, so an unchanged payload comes back as a bodiless 304.
+    _count_request(method, endpoint, "calls")
+    if method != "GET":
+        # Shielded so that a caller timing out does not abort a write the backend may
+        # already be applying.
+        return await asyncio.shield(asyncio.ensure_future(
+            _perform_request(method, endpoint, cookies, json_data, params, data, download=download)
+        ))
+
+    _request_stats["get_requests"] += 1
+    key = _request_key(method, endpoint, cookies, params)
+    inflight = _inflight_gets.get(key)
+    if inflight is not None:
+        _request_stats["coalesced_gets"] += 1
+        _count_request(method, endpoint, "coalesced")
+    else:
+        inflight = asyncio.ensure_future(
+            _perform_request(method, endpoint, cookies, json_data, params, data, conditional, keep_body)
+        )
+        _inflight_gets[key] = inflight
+        inflight.add_done_callback(lambda _: _inflight_gets.pop(key, None))
+    # Shielded so that one caller timing out does not cancel the call for the others.
+    return await asyncio.shield(inflight)
+
+
+async def _bounded_call(call: Awaitable[Dict[str, Any]], timeout: Optional[float]) -> Dict[str, Any]:
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        return {"success": False, "error": f"Request timed out after {timeout} s"}
     except Exception as e:
         return {"success": False, "error": f"An unexpected error occurred: {str(e)}"}
 
-def login_user(email: str, password: str) -> Dict[str, Any]:
-    try:
-        s = requests.Session()
-        response = s.post(f"{BACKEND_URL}/api/auth/login", json={"email": email, "password": password})
+
+async def gather_requests(*calls: Awaitable[Dict[str, Any]],
+                          timeout: Optional[float] = FANOUT_CALL_TIMEOUT_SECONDS) -> List[Dict[str, Any]]:
+    # Runs independent backend calls concurrently. Each call gets its own timeout and a
+    # failure of one never cancels the others: every slot gets a result dict, in order.
+    return list(await asyncio.gather(*(_bounded_call(call, timeout) for call in calls)))
+
+
+async def _stream_file(file_url: str) -> AsyncIterator[bytes]:
+    session = await _get_session()
+    async with session.get(file_url) as response:
         response.raise_for_status()
-        return {"success": True, "data": response.json(), "cookies": s.cookies.get_dict()}
-    except requests.exceptions.HTTPError as http_err:
-        error_message = "Login failed."
+        async for chunk in response.content.iter_chunked(UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+
+# Telegram file URLs contain the bot token: download errors are logged without the
+# URL and reported to the user with this generic result instead of the exception text.
+_DOWNLOAD_FAILED = {"success": False, "error": "Could not download the image from Telegram, please send it again"}
+
+
+def _log_download_error(e: Exception) -> None:
+    status = getattr(e, "status", None)
+    print(f"Telegram file download failed: {type(e).__name__}" + (f" (HTTP {status})" if status else ""))
+
+
+class _FileDownload:
+    # A Telegram download piped into a backend upload. A failure here surfaces as a
+    # failed upload, so it is flagged: the caller then reports _DOWNLOAD_FAILED and
+    # does not count it against backend_breaker.
+
+    def __init__(self, file_url: str):
+        self.file_url = file_url
+        self.failed = False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
         try:
-            error_details = http_err.response.json()
-            error_message = error_details.get("message", str(http_err.response.text))
-        except ValueError:
-            error_message = str(http_err.response.text if http_err.response.text else http_err) 
-        return {"success": False, "error": error_message, "status_code": http_err.response.status_code if http_err.response else None}
-    except requests.exceptions.RequestException as e:
+            async for chunk in _stream_file(self.file_url):
+                yield chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.failed = True
+            _log_download_error(e)
+            raise
+
+
+async def _download_file(file_url: str) -> bytearray:
+    content = bytearray()
+    async for chunk in _stream_file(file_url):
+        content.extend(chunk)
+    return content
+
+
+def _multipart_with_file(fields: Dict[str, Any], file_field: str, file_content: Any, mime_type: str) -> aiohttp.MultipartWriter:
+    writer = aiohttp.MultipartWriter("form-data")
+    for name, value in fields.items():
+        if value is None:
+            continue
+        part = writer.append(value if isinstance(value, str) else json.dumps(value))
+        part.set_content_disposition("form-data", name=name)
+    if isinstance(file_content, (bytes, bytearray)):
+        file_part = writer.append(bytes(file_content), {"Content-Type": mime_type})
+    else:
+        file_part = writer.append_payload(AsyncIterablePayload(file_content, content_type=mime_type))
+    extension = mime_type.split("/")[-1].replace("jpeg", "jpg")
+    file_part.set_content_disposition("form-data", name=file_field, filename=f"{file_field}.{extension}")
+    return writer
+
+
+async def _send_with_image(method: str, endpoint: str, cookies: Dict, fields: Dict[str, Any], image_field: str,
+                           image_url: str, mime_type: str) -> Dict[str, Any]:
+    # Without a processing stage the image never exists in memory as a whole in
+    # multipart mode: Telegram's download is piped chunk by chunk into the upload.
+    if IMAGE_UPLOAD_MODE == "multipart" and not image_processing.IMAGE_PROCESSING_ENABLED:
+        download = _FileDownload(image_url)
+        body = _multipart_with_file(fields, image_field, download.chunks(), mime_type)
+        return await _make_request(method, endpoint, cookies=cookies, data=body, download=download)
+    try:
+        image_bytes = await _download_file(image_url)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        _log_download_error(e)
+        return dict(_DOWNLOAD_FAILED)
+    image_bytes, mime_type = await image_processing.process_image(image_bytes, mime_type)
+    if IMAGE_UPLOAD_MODE == "multipart":
+        body = _multipart_with_file(fields, image_field, image_bytes, mime_type)
+        return await _make_request(method, endpoint, cookies=cookies, data=body)
+    payload = dict(fields)
+    payload[image_field] = encode_image_to_base64(image_bytes, mime_type=mime_type)
+    del image_bytes
+    return await _make_request(method, endpoint, cookies=cookies, json_data=payload)
+
+
+async def _auth_request(endpoint: str, payload: Dict, default_error: str) -> Dict[str, Any]:
+    try:
+        session = await _get_session()
+        async with session.post(f"{BACKEND_URL}{endpoint}", json=payload) as response:
+            if response.status >= 400:
+                error_message = await _error_message(response, default_error)
+                return {"success": False, "error": error_message, "status_code": response.status}
+            data = await response.json(content_type=None)
+            cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+            return {"success": True, "data": data, "cookies": cookies}
+    except aiohttp.ClientError as e:
         return {"success": False, "error": str(e)}
 
 
-def register_user(
+async def login_user(email: str, password: str) -> Dict[str, Any]:
+    return await _auth_request("/api/auth/login", {"email": email, "password": password}, "Login failed.")
+
+
+async def register_user(
         full_name: str,
         email: str,
         password: str,
@@ -50,75 +380,102 @@ def register_user(
         city: Optional[str] = None,
         preferences: Optional[List[str]] = None
 ) -> Dict[str, Any]:
-    try:
-        s = requests.Session()
-        payload = {
-            "fullName": full_name,
-            "email": email,
-            "password": password
-        }
-        # If telegram_id (now holding the username) is not None and not an empty string,
-        # it will be added to the payload with the key "telegramId".
-        # Usernames are already strings. If None, it's correctly skipped.
-        if telegram_id:
-            payload["telegramId"] = telegram_id
-
-        if country:
-            payload["country"] = country
-        if city:
-            payload["city"] = city
-
-        payload["preferences"] = preferences if preferences is not None else []
-
-        response = s.post(f"{BACKEND_URL}/api/auth/signup", json=payload)
-        response.raise_for_status()
-        return {"success": True, "data": response.json(), "cookies": s.cookies.get_dict()}
-    except requests.exceptions.HTTPError as http_err:
-        error_message = "Registration failed."
-        try:
-            error_details = http_err.response.json()
-            error_message = error_details.get("message", str(http_err.response.text))
-        except ValueError:
-            error_message = str(http_err.response.text if http_err.response.text else http_err)
-        return {"success": False, "error": error_message,
-                "status_code": http_err.response.status_code if http_err.response else None}
-    except requests.exceptions.RequestException as e:
-        return {"success": False, "error": str(e)}
+    payload = {
+        "fullName": full_name,
+        "email": email,
+        "password": password
+    }
+    # If telegram_id (now holding the username) is not None and not an empty string,
+    # it will be added to the payload with the key "telegramId".
+    # Usernames are already strings. If None, it's correctly skipped.
+    if telegram_id:
+        payload["telegramId"] = telegram_id
+
+    if country:
+        payload["country"] = country
+    if city:
+        payload["city"] = city
 
+    payload["preferences"] = preferences if preferences is not None else []
 
-def logout_user(cookies: Dict) -> Dict[str, Any]:
-    return _make_request("POST", "/api/auth/logout", cookies=cookies)
+    return await _auth_request("/api/auth/signup", payload, "Registration failed.")
 
-def check_auth_status(cookies: Dict) -> Dict[str, Any]:
-    return _make_request("GET", "/api/auth/check", cookies=cookies)
 
-def update_user_profile(cookies: Dict, profile_data: Dict) -> Dict[str, Any]:
-    return _make_request("PUT", "/api/auth/update-profile", cookies=cookies, json_data=profile_data)
+async def logout_user(cookies: Dict) -> Dict[str, Any]:
+    return await _make_request("POST", "/api/auth/logout", cookies=cookies)
+
+async def check_auth_status(cookies: Dict) -> Dict[str, Any]:
+    return await _make_request("GET", "/api/auth/check", cookies=cookies)
+
+async def update_user_profile(cookies: Dict, profile_data: Dict) -> Dict[str, Any]:
+    return await _make_request("PUT", "/api/auth/update-profile", cookies=cookies, json_data=profile_data)
+
+async def update_profile_picture(cookies: Dict, image_url: str, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    return await _send_with_image("PUT", "/api/auth/update-profile", cookies, {}, "profilePic", image_url, mime_type)
 
 # --- Books ---
-def get_all_books(cookies: Optional[Dict] = None) -> Dict[str, Any]:
-    return _make_request("GET", "/api/books", cookies=cookies)
+async def _fetch_all_books() -> Dict[str, Any]:
+    # CatalogCache keeps the books as BookRecords; holding the raw JSON here as well
+    # would double the catalog's memory.
+    return await _make_request("GET", "/api/books", conditional=True, keep_body=False)
+
+async def _fetch_changed_books(updated_since: str) -> Dict[str, Any]:
+    return await _make_request("GET", "/api/books", params={"updatedSince": updated_since})
+
+# The catalog is the same for every user, so it is fetched without cookies and shared.
+catalog = CatalogCache(
+    _fetch_all_books,
+    ttl=CATALOG_TTL_SECONDS,
+    max_stale=CATALOG_MAX_STALE_SECONDS,
+    fetch_changes=_fetch_changed_books if CATALOG_SYNC_MODE == "incremental" else None,
+    full_sync_every=CATALOG_FULL_SYNC_EVERY,
+    make_record=BookRecord,
+)
+
+async def get_all_books(cookies: Optional[Dict] = None) -> Dict[str, Any]:
+    return await catalog.get_books()
+
+async def get_my_books(cookies: Dict) -> Dict[str, Any]:
+    return await _make_request("GET", "/api/books/my-books", cookies=cookies)
+
+def _invalidate_catalog_on_success(result: Dict[str, Any]) -> Dict[str, Any]:
+    if result.get("success"):
+        catalog.invalidate()
+    return result
+
+async def create_book(cookies: Dict, book_data: Dict) -> Dict[str, Any]:
+    result = await _make_request("POST", "/api/books/create", cookies=cookies, json_data=book_data)
+    return _invalidate_catalog_on_success(result)
+
+async def create_book_with_image(cookies: Dict, book_data: Dict, image_url: str, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    result = await _send_with_image("POST", "/api/books/create", cookies, book_data, "image", image_url, mime_type)
+    return _invalidate_catalog_on_success(result)
 
-def get_my_books(cookies: Dict) -> Dict[str, Any]:
-    return _make_request("GET", "/api/books/my-books", cookies=cookies)
+async def update_book(cookies: Dict, book_id: str, book_data: Dict) -> Dict[str, Any]:
+    result = await _make_request("POST", f"/api/books/update/{book_id}", cookies=cookies, json_data=book_data)
+    return _invalidate_catalog_on_success(result)
 
-def create_book(cookies: Dict, book_data: Dict) -> Dict[str, Any]:
-    return _make_request("POST", "/api/books/create", cookies=cookies, json_data=book_data)
+async def delete_book(cookies: Dict, book_id: str) -> Dict[str, Any]:
+    result = await _make_request("DELETE", f"/api/books/{book_id}", cookies=cookies)
+    if result.get("success"):
+        catalog.discard(book_id)
+    return _invalidate_catalog_on_success(result)
 
-def update_book(cookies: Dict, book_id: str, book_data: Dict) -> Dict[str, Any]:
-    return _make_request("POST", f"/api/books/update/{book_id}", cookies=cookies, json_data=book_data)
+async def _fetch_categories(cookies: Optional[Dict] = None) -> Dict[str, Any]:
+    return await _make_request("GET", "/api/books/categories", cookies=cookies, conditional=True)
 
-def delete_book(cookies: Dict, book_id: str) -> Dict[str, Any]:
-    return _make_request("DELETE", f"/api/books/{book_id}", cookies=cookies)
+# Categories rarely change: they are shared process-wide and, once the TTL is up,
+# revalidated with a conditional GET instead of downloaded again.
+categories = CatalogCache(_fetch_categories, ttl=CATEGORIES_TTL_SECONDS, max_stale=CATEGORIES_TTL_SECONDS)
 
-def get_all_categories(cookies: Dict) -> Dict[str, Any]:
-    return _make_request("GET", "/api/books/categories", cookies=cookies)
+async def get_all_categories(cookies: Dict) -> Dict[str, Any]:
+    return await categories.get_books(cookies)
 
-def update_user_preferences(cookies: Dict, category_ids: List[str]) -> Dict[str, Any]:
-    return _make_request("POST", "/api/auth/update-preferences", cookies=cookies, json_data={"preferences": category_ids})
+async def update_user_preferences(cookies: Dict, category_ids: List[str]) -> Dict[str, Any]:
+    return await _make_request("POST", "/api/auth/update-preferences", cookies=cookies, json_data={"preferences": category_ids})
 
-def get_user_current_preferences(cookies: Dict) -> Dict[str, Any]:
-    auth_status = check_auth_status(cookies)
+async def get_user_current_preferences(cookies: Dict) -> Dict[str, Any]:
+    auth_status = await check_auth_status(cookies)
     if auth_status["success"] and auth_status["data"]:
         return {"success": True, "data": auth_status["data"].get("preferences")}
     return {"success": False, "error": auth_status.get("error", "Could not fetch user preferences")}
@@ -126,15 +483,14 @@ def get_user_current_preferences(cookies: Dict) -> Dict[str, Any]:
 
 # --- User ---
 async def get_user_by_id_async(owner_id: str, cookies: dict):
-    import aiohttp # Local import for async function
     try:
         url = f"{BACKEND_URL}/api/user/{owner_id}"
-        async with aiohttp.ClientSession(cookies=cookies) as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    text = await response.text()
-                    return {"success": False, "error": f"Error {response.status}: {text}", "status_code": response.status}
-                data = await response.json()
-                return {"success": True, "data": data}
+        session = await _get_session()
+        async with session.get(url, cookies=cookies) as response:
+            if response.status != 200:
+                text = await response.text()
+                return {"success": False, "error": f"Error {response.status}: {text}", "status_code": response.status}
+            data = await response.json()
+            return {"success": True, "data": data}
     except Exception as e:
-        return {"success": False, "error": f"[get_user_by_id_async] Exception: {e}"}
\ No newline at end of file
+        return {"success": False, "error": f"[get_user_by_id_async] Exception: {e}"}
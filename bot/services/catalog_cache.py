@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+Fetcher = Callable[..., Awaitable[Dict[str, Any]]]
+ChangeFetcher = Callable[[str], Awaitable[Dict[str, Any]]]
+
+# (position, old record or None, new record) for every book an incremental sync touched.
+Change = Tuple[int, Optional[Dict], Dict]
+
+
+def _is_deleted(book: Dict) -> bool:
+    return bool(book.get("isDeleted") or book.get("deleted"))
+
+
+class CatalogCache:
+    # Fresh data is served from memory; data past its TTL but within max_stale is still
+    # served while one background refresh runs. Invalidated or too-old data waits for
+    # the refresh, and is served anyway if that refresh fails. Concurrent callers always
+    # share a single in-flight fetch.
+    #
+    # With fetch_changes, refreshes after the first one only ask the backend for books
+    # whose updatedAt is newer than the last one seen and merge them in place by _id.
+    # Every full_sync_every-th refresh is a full reload, which also catches deletions
+    # the backend does not report.
+
+    def __init__(self, fetch: Fetcher, ttl: float = 60, max_stale: float = 600,
+                 fetch_changes: Optional[ChangeFetcher] = None, full_sync_every: int = 20,
+                 make_record: Optional[Callable[[Dict], Any]] = None):
+        self._fetch = fetch
+        self._fetch_changes = fetch_changes
+        # Converts each fetched JSON book into the form kept in memory (e.g. BookRecord).
+        self._make_record = make_record or (lambda book: book)
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.full_sync_every = full_sync_every
+        self._books: Optional[List[Dict]] = None
+        self._positions: Dict[str, int] = {}
+        self._sync_cursor: Optional[str] = None
+        self._syncs_since_full = 0
+        self._fetched_at = 0.0
+        self._write_generation = 0
+        self._fresh_generation = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._derived: Dict[str, Tuple[int, Any]] = {}
+        self.version = 0
+
+    async def get_books(self, *fetch_args) -> Dict[str, Any]:
+        age = time.monotonic() - self._fetched_at
+        if self._books is not None and self._fresh_generation == self._write_generation:
+            if age < self.ttl:
+                return {"success": True, "data": self._books}
+            if age < self.ttl + self.max_stale:
+                self._start_refresh(*fetch_args)
+                return {"success": True, "data": self._books}
+        return await asyncio.shield(self._start_refresh(*fetch_args))
+
+    def get_by_id(self, book_id: str) -> Optional[Dict]:
+        position = self._positions.get(book_id)
+        return self._books[position] if position is not None else None
+
+    def position_of(self, book_id: str) -> Optional[int]:
+        return self._positions.get(book_id)
+
+    def derived(self, name: str, build: Callable[[List[Dict]], Any]) -> Any:
+        # Structures computed from the catalog (indexes, sort orders...) are built once
+        # per catalog version and shared by every user until the next refresh.
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        value = build(self._books or [])
+        self._derived[name] = (self.version, value)
+        return value
+
+    def invalidate(self) -> None:
+        self._write_generation += 1
+
+    def discard(self, book_id: str) -> None:
+        # A book we deleted ourselves can be dropped right away, without a full reload.
+        if book_id in self._positions:
+            self._set_books([book for book in self._books if book.get("_id") != book_id])
+
+    def _start_refresh(self, *fetch_args) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh(*fetch_args))
+        return self._refresh_task
+
+    async def _refresh(self, *fetch_args) -> Dict[str, Any]:
+        started_at = time.monotonic()
+        generation = self._write_generation
+        incremental = (self._fetch_changes is not None and self._books is not None
+                       and self._sync_cursor is not None and self._syncs_since_full < self.full_sync_every)
+        if incremental:
+            result = await self._fetch_changes(self._sync_cursor)
+        else:
+            result = await self._fetch(*fetch_args)
+        if result.get("success"):
+            if incremental:
+                self._apply_changes(result.get("data") or [])
+                self._syncs_since_full += 1
+            else:
+                # An unchanged payload (304) keeps the version, so derived structures survive.
+                if not (result.get("not_modified") and self._books is not None):
+                    self._replace_books(result.get("data") or [])
+                self._syncs_since_full = 0
+            self._fetched_at = started_at
+            # A write that landed while we were fetching is not covered by this result.
+            self._fresh_generation = generation
+            result = {"success": True, "data": self._books}
+        elif self._books is not None:
+            # The backend is failing; the last good copy beats an error for a catalog.
+            return {"success": True, "data": self._books, "stale": True}
+        return result
+
+    def _replace_books(self, books: List[Dict]) -> None:
+        self._advance_cursor(books)
+        self._set_books([self._make_record(book) for book in books])
+
+    def _set_books(self, books: List[Any]) -> None:
+        self._books = books
+        self._positions = {book.get("_id"): position for position, book in enumerate(books)}
+        self.version += 1
+
+    def _advance_cursor(self, books: List[Dict]) -> None:
+        for book in books:
+            updated_at = book.get("updatedAt")
+            if updated_at and (self._sync_cursor is None or updated_at > self._sync_cursor):
+                self._sync_cursor = updated_at
+
+    def _apply_changes(self, changed_books: List[Dict]) -> None:
+        if not changed_books:
+            return
+        if any(_is_deleted(book) and book.get("_id") in self._positions for book in changed_books):
+            # Removals shift positions; rebuild the list and let derived data rebuild too.
+            changed = {book.get("_id"): book for book in changed_books}
+            books = []
+            for book in self._books:
+                changed_book = changed.pop(book.get("_id"), None)
+                if changed_book is None:
+                    books.append(book)
+                elif not _is_deleted(changed_book):
+                    books.append(self._make_record(changed_book))
+            books.extend(self._make_record(book) for book in changed.values() if not _is_deleted(book))
+            self._set_books(books)
+            self._advance_cursor(changed_books)
+            return
+
+        changes: List[Change] = []
+        for book in changed_books:
+            if _is_deleted(book):
+                continue
+            position = self._positions.get(book.get("_id"))
+            book = self._make_record(book)
+            if position is None:
+                position = len(self._books)
+                self._books.append(book)
+                self._positions[book.get("_id")] = position
+                changes.append((position, None, book))
+            else:
+                changes.append((position, self._books[position], book))
+                self._books[position] = book
+        self._advance_cursor(changed_books)
+        self.version += 1
+        # Derived structures that know how to patch themselves are carried over to the
+        # new version; the rest are rebuilt on their next use.
+        for name, (version, value) in list(self._derived.items()):
+            if version == self.version - 1 and hasattr(value, "apply_changes"):
+                value.apply_changes(changes)
+                self._derived[name] = (self.version, value)
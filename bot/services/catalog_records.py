@@ -0,0 +1,143 @@
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Descriptions shorter than this are kept as plain strings; compressing them saves nothing.
+_COMPRESS_MIN_LENGTH = 64
+# Stands for a field the backend did not send, so get() can tell it from a null one.
+_MISSING = object()
+_FIELDS = (
+    "_id", "title", "author", "price", "language", "type", "publishedDate", "updatedAt",
+    "owner", "image", "categories", "description",
+)
+_FIELD_NAMES = frozenset(_FIELDS)
+# Short strings with few distinct values across the catalog; each distinct value is kept once.
+_INTERNED_FIELDS = ("author", "language", "type", "publishedDate")
+
+# Tags of frozen dicts and lists (see _freeze); compared by identity, so a frozen list
+# never equals a frozen dict with the same items.
+_DICT = object()
+_LIST = object()
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return (_DICT,) + tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return (_LIST,) + tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, tuple):
+        if value[0] is _DICT:
+            return {key: _thaw(item) for key, item in value[1:]}
+        return [_thaw(item) for item in value[1:]]
+    return value
+
+
+class ValueInterner:
+    # Every distinct JSON value (a category, an owner...) is stored once, frozen, and
+    # referred to by a small int, instead of a nested dict repeated in every book.
+    # expand() builds a fresh copy, so a caller changing it never changes other books.
+
+    def __init__(self):
+        self._codes: Dict[Any, int] = {}
+        self._entries: List[Any] = []
+
+    def intern(self, value: Any) -> int:
+        frozen = _freeze(value)
+        code = self._codes.get(frozen)
+        if code is None:
+            code = len(self._entries)
+            self._codes[frozen] = code
+            self._entries.append(frozen)
+        return code
+
+    def expand(self, code: int) -> Any:
+        return _thaw(self._entries[code])
+
+
+values = ValueInterner()
+
+
+class BookRecord:
+    # Read-only, compact form of a catalog book. get()/[] answer exactly as the JSON dict
+    # the backend returned would, so format_book_message and the pagination views read it
+    # as is:
+    #   - a field the backend did not send gives the default (KeyError for []), while a
+    #     field sent as null gives None;
+    #   - fields not listed in _FIELDS are kept as they are, in _extra;
+    #   - owner and categories are interned in `values` and come back as fresh copies;
+    #   - long descriptions are zlib-compressed and decompressed when read.
+    __slots__ = (
+        "_id", "title", "author", "price", "language", "type", "publishedDate", "updatedAt",
+        "_owner", "image", "_categories", "_description", "_extra",
+    )
+
+    def __init__(self, book: Dict[str, Any]):
+        self._id = book.get("_id", _MISSING)
+        self.title = book.get("title", _MISSING)
+        self.author = book.get("author", _MISSING)
+        self.price = book.get("price", _MISSING)
+        self.language = book.get("language", _MISSING)
+        self.type = book.get("type", _MISSING)
+        self.publishedDate = book.get("publishedDate", _MISSING)
+        self.updatedAt = book.get("updatedAt", _MISSING)
+        self.image = book.get("image", _MISSING)
+        for field in _INTERNED_FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, str):
+                setattr(self, field, sys.intern(value))
+        self._owner = values.intern(book["owner"]) if "owner" in book else _MISSING
+        categories = book.get("categories", _MISSING)
+        if isinstance(categories, list):
+            categories = tuple(values.intern(category) for category in categories)
+        self._categories = categories
+        description = book.get("description", _MISSING)
+        if isinstance(description, str) and len(description) >= _COMPRESS_MIN_LENGTH:
+            description = zlib.compress(description.encode("utf-8"))
+        self._description = description
+        extra = {key: value for key, value in book.items() if key not in _FIELD_NAMES}
+        self._extra: Optional[Dict[str, Any]] = extra or None
+
+    @property
+    def owner(self) -> Any:
+        return values.expand(self._owner) if self._owner is not _MISSING else _MISSING
+
+    @property
+    def categories(self) -> Any:
+        if isinstance(self._categories, tuple):
+            return [values.expand(code) for code in self._categories]
+        return self._categories
+
+    @property
+    def description(self) -> Any:
+        # Long descriptions are only decompressed when a view actually shows them.
+        if isinstance(self._description, bytes):
+            return zlib.decompress(self._description).decode("utf-8")
+        return self._description
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_NAMES:
+            value = getattr(self, key)
+        elif self._extra is not None:
+            value = self._extra.get(key, _MISSING)
+        else:
+            value = _MISSING
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def to_dict(self) -> Dict[str, Any]:
+        book = {key: self.get(key, _MISSING) for key in _FIELDS}
+        book = {key: value for key, value in book.items() if value is not _MISSING}
+        book.update(self._extra or {})
+        return book
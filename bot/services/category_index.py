@@ -0,0 +1,53 @@
+from typing import Dict, Iterable, List, Set
+
+
+def book_category_keys(book: dict) -> List[str]:
+    # Categories come either populated ({"_id": ..., "name": ...}) or as bare strings,
+    # the same two shapes format_book_message handles.
+    keys = []
+    for cat in book.get("categories") or []:
+        if isinstance(cat, dict):
+            if cat.get("_id"):
+                keys.append(cat["_id"])
+            if cat.get("name"):
+                keys.append(cat["name"])
+        elif isinstance(cat, str) and cat:
+            keys.append(cat)
+    return keys
+
+
+class CategoryIndex:
+    def __init__(self, books: List[dict]):
+        self.books = books
+        self.postings: Dict[str, Set[int]] = {}
+        for position, book in enumerate(books):
+            self._add(position, book)
+
+    def _add(self, position: int, book: dict) -> None:
+        for key in book_category_keys(book):
+            self.postings.setdefault(key, set()).add(position)
+
+    def _remove(self, position: int, book: dict) -> None:
+        for key in book_category_keys(book):
+            posting = self.postings.get(key)
+            if posting is not None:
+                posting.discard(position)
+                if not posting:
+                    del self.postings[key]
+
+    def apply_changes(self, changes) -> None:
+        # Called by CatalogCache after an incremental sync with (position, old, new)
+        # entries; self.books is the catalog list itself and already holds the new books.
+        for position, old_book, new_book in changes:
+            if old_book is not None:
+                self._remove(position, old_book)
+            self._add(position, new_book)
+
+    def positions_for(self, category_keys: Iterable[str]) -> List[int]:
+        matched = set()
+        for key in category_keys:
+            matched.update(self.postings.get(key, ()))
+        return sorted(matched)
+
+    def books_for(self, category_keys: Iterable[str]) -> List[dict]:
+        return [self.books[position] for position in self.positions_for(category_keys)]
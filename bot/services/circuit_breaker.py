@@ -0,0 +1,42 @@
+import time
+
+
+class CircuitBreaker:
+    # Closed: calls go through. After failure_threshold consecutive failures the breaker
+    # opens and calls fail fast for reset_timeout seconds; then a single trial call is
+    # let through (half-open) and its outcome closes or re-opens the breaker.
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_progress:
+            return False
+        self._trial_in_progress = True
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_in_progress or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._trial_in_progress = False
+
+    def release_trial(self) -> None:
+        # The call ended without saying anything about the backend (e.g. its upload
+        # source failed first): let the next call be the trial instead.
+        self._trial_in_progress = False
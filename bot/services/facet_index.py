@@ -0,0 +1,135 @@
+import bisect
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from bot import config
+
+# Upper bounds of the price buckets; a price of 0 (or none) is its own "free" bucket.
+FILTER_PRICE_BOUNDS = getattr(config, "FILTER_PRICE_BOUNDS", (1000, 5000, 10000))
+# Publication years are bucketed as [.., 1900), [1900, 2000), ..., [2020, ..).
+FILTER_YEAR_BOUNDS = getattr(config, "FILTER_YEAR_BOUNDS", (1900, 2000, 2010, 2020))
+
+FACETS = ("price", "language", "type", "date")
+
+Selection = Mapping[str, Iterable[str]]
+
+
+def _range_keys(bounds, start: str) -> List[str]:
+    lowers = [start] + [str(bound) for bound in bounds]
+    return [f"{lower}-{upper}" for lower, upper in zip(lowers, bounds)] + [f"{lowers[-1]}+"]
+
+
+# Bucket keys in display order: "free", "0-1000", ..., "10000+" and "-1900", ..., "2020+".
+PRICE_BUCKETS = ["free"] + _range_keys(FILTER_PRICE_BOUNDS, "0")
+YEAR_BUCKETS = _range_keys(FILTER_YEAR_BOUNDS, "")
+BUCKET_ORDER = {
+    "price": {key: rank for rank, key in enumerate(PRICE_BUCKETS)},
+    "date": {key: rank for rank, key in enumerate(YEAR_BUCKETS)},
+}
+
+
+def _price_bucket(price) -> Optional[str]:
+    if price is None or price == 0:
+        return "free"
+    if not isinstance(price, (int, float)):
+        return None
+    return PRICE_BUCKETS[1 + bisect.bisect_left(FILTER_PRICE_BOUNDS, price)]
+
+
+def _year_bucket(published_date) -> Optional[str]:
+    if not isinstance(published_date, str) or not published_date[:4].isdigit():
+        return None
+    return YEAR_BUCKETS[bisect.bisect_right(FILTER_YEAR_BOUNDS, int(published_date[:4]))]
+
+
+def _text_value(value) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().lower()
+
+
+def book_facet_values(book: dict) -> Dict[str, str]:
+    values = {
+        "price": _price_bucket(book.get("price")),
+        "language": _text_value(book.get("language")),
+        "type": _text_value(book.get("type")),
+        "date": _year_bucket(book.get("publishedDate")),
+    }
+    return {facet: value for facet, value in values.items() if value is not None}
+
+
+def bitmap_bits(bitmap: int) -> str:
+    # Character N is bit N ("0"/"1"): one conversion, then cheap membership tests while
+    # walking positions in some other order.
+    return bin(bitmap)[:1:-1]
+
+
+def bitmap_count(bitmap: int) -> int:
+    return bin(bitmap).count("1")
+
+
+class FacetIndex:
+    # One bitmap (a Python int, bit N = catalog position N) per value of every facet.
+    # Values selected within a facet are OR-ed, facets are AND-ed, so any combination
+    # of filters is a few big-int operations instead of a scan over the catalog.
+
+    def __init__(self, books: List[dict]):
+        self.books = books
+        self.bitmaps: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self.all_books = 0
+        for position, book in enumerate(books):
+            self._add(position, book)
+
+    def _add(self, position: int, book: dict) -> None:
+        bit = 1 << position
+        self.all_books |= bit
+        for facet, value in book_facet_values(book).items():
+            values = self.bitmaps[facet]
+            values[value] = values.get(value, 0) | bit
+
+    def _remove(self, position: int, book: dict) -> None:
+        bit = 1 << position
+        self.all_books &= ~bit
+        for facet, value in book_facet_values(book).items():
+            values = self.bitmaps[facet]
+            remaining = values.get(value, 0) & ~bit
+            if remaining:
+                values[value] = remaining
+            else:
+                values.pop(value, None)
+
+    def apply_changes(self, changes) -> None:
+        # Same contract as CategoryIndex.apply_changes.
+        for position, old_book, new_book in changes:
+            if old_book is not None:
+                self._remove(position, old_book)
+            self._add(position, new_book)
+
+    def matching(self, selection: Selection, skip_facet: Optional[str] = None) -> int:
+        bitmap = self.all_books
+        for facet, selected_values in selection.items():
+            if facet == skip_facet or not selected_values:
+                continue
+            facet_bitmap = 0
+            for value in selected_values:
+                facet_bitmap |= self.bitmaps.get(facet, {}).get(value, 0)
+            bitmap &= facet_bitmap
+        return bitmap
+
+    def counts(self, selection: Selection, facet: str, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+        # How many books each value of facet would give, combined with the filters
+        # chosen on the other facets. Values with no books left are still listed when
+        # they are selected, so they can be switched off.
+        others = self.matching(selection, skip_facet=facet)
+        selected_values = set(selection.get(facet, ()))
+        counts = []
+        for value, bitmap in self.bitmaps[facet].items():
+            count = bitmap_count(bitmap & others)
+            if count or value in selected_values:
+                counts.append((value, count))
+        order = BUCKET_ORDER.get(facet)
+        if order is not None:
+            # Buckets keep their natural order; free-text values go by count.
+            counts.sort(key=lambda item: order.get(item[0], len(order)))
+        else:
+            counts.sort(key=lambda item: (item[0] not in selected_values, -item[1], item[0]))
+        return counts[:limit] if limit is not None else counts
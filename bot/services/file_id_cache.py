@@ -0,0 +1,57 @@
+import sqlite3
+from collections import OrderedDict
+from typing import Optional
+
+from bot import config
+
+FILE_ID_CACHE_SIZE = getattr(config, "FILE_ID_CACHE_SIZE", 5000)
+# Set to a SQLite path to keep file_ids across restarts; None keeps them in memory only.
+FILE_ID_CACHE_DB_PATH = getattr(config, "FILE_ID_CACHE_DB_PATH", None)
+
+
+class FileIdCache:
+    # Maps an image URL to the Telegram file_id it got on its first send, so repeat
+    # sends reuse Telegram's copy instead of making Telegram fetch the URL again.
+
+    def __init__(self, max_entries: int = FILE_ID_CACHE_SIZE, db_path: Optional[str] = FILE_ID_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS file_ids (source TEXT PRIMARY KEY, file_id TEXT NOT NULL)")
+
+    def get(self, source: str) -> Optional[str]:
+        file_id = self._entries.get(source)
+        if file_id is None and self._db is not None:
+            row = self._db.execute("SELECT file_id FROM file_ids WHERE source = ?", (source,)).fetchone()
+            if row:
+                file_id = row[0]
+                self._remember(source, file_id)
+        elif file_id is not None:
+            self._entries.move_to_end(source)
+        return file_id
+
+    def put(self, source: str, file_id: str) -> None:
+        if self._entries.get(source) == file_id:
+            return
+        self._remember(source, file_id)
+        if self._db is not None:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO file_ids (source, file_id) VALUES (?, ?)", (source, file_id))
+
+    def discard(self, source: str) -> None:
+        self._entries.pop(source, None)
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM file_ids WHERE source = ?", (source,))
+
+    def _remember(self, source: str, file_id: str) -> None:
+        self._entries[source] = file_id
+        self._entries.move_to_end(source)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+file_ids = FileIdCache()
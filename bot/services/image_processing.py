@@ -0,0 +1,75 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+
+from bot import config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are uploaded as received.
+    Image = None
+    ImageOps = None
+
+IMAGE_MAX_DIMENSION = getattr(config, "IMAGE_MAX_DIMENSION", 1280)
+IMAGE_FORMAT = getattr(config, "IMAGE_FORMAT", "JPEG")  # "JPEG" or "WEBP"
+IMAGE_QUALITY = getattr(config, "IMAGE_QUALITY", 85)
+IMAGE_PROCESSING_ENABLED = getattr(config, "IMAGE_PROCESSING_ENABLED", True) and Image is not None
+IMAGE_PROCESS_WORKERS = getattr(config, "IMAGE_PROCESS_WORKERS", 2)
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def select_photo_size(photo_sizes: Sequence, max_dimension: int = IMAGE_MAX_DIMENSION):
+    # Telegram sends every photo in several sizes. The smallest one that still covers
+    # max_dimension is all we need, so larger originals are never downloaded.
+    sizes = sorted(photo_sizes, key=lambda size: size.width * size.height)
+    for size in sizes:
+        if max(size.width, size.height) >= max_dimension:
+            return size
+    return sizes[-1]
+
+
+def _recompress(image_bytes: bytes, max_dimension: int, image_format: str, quality: int) -> bytes:
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Apply the EXIF orientation before it is stripped, then drop all metadata.
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension))
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, optimize=True)
+        return output.getvalue()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned rather than forked: the bot process already runs threads (SQLite
+        # writers, the aiohttp resolver), and forking a threaded process can deadlock.
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def process_image(image_bytes: bytes, mime_type: str = "image/jpeg") -> Tuple[bytes, str]:
+    if not IMAGE_PROCESSING_ENABLED:
+        return image_bytes, mime_type
+    loop = asyncio.get_running_loop()
+    try:
+        processed = await loop.run_in_executor(
+            _get_pool(), _recompress, bytes(image_bytes), IMAGE_MAX_DIMENSION, IMAGE_FORMAT, IMAGE_QUALITY
+        )
+    except Exception as e:
+        print(f"Image processing failed, uploading the original: {e}")
+        return image_bytes, mime_type
+    return processed, _MIME_TYPES.get(IMAGE_FORMAT, mime_type)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
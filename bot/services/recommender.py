@@ -0,0 +1,41 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from bot import config
+from bot.services.category_index import CategoryIndex
+
+RECOMMENDATIONS_LIMIT = getattr(config, "RECOMMENDATIONS_LIMIT", 50)
+
+
+def _category_positions(index: CategoryIndex, keys: Iterable[Optional[str]]) -> set:
+    # A single category may be indexed under both its id and its name.
+    return set(index.positions_for(key for key in keys if key))
+
+
+def rank_books(index: CategoryIndex, preferred_categories: Sequence[Iterable[Optional[str]]],
+               limit: int = RECOMMENDATIONS_LIMIT) -> List[dict]:
+    # Each entry of preferred_categories is the group of keys (id, name) naming one
+    # category. A book scores the sum of the IDF weights of the preferred categories
+    # it carries, so rare shared genres outweigh ubiquitous ones. Ties are broken by
+    # the newest publishedDate and then by catalog order, which keeps the result
+    # deterministic for the same catalog.
+    total_books = len(index.books)
+    if not total_books or limit <= 0:
+        return []
+
+    scores: Dict[int, float] = {}
+    for keys in preferred_categories:
+        positions = _category_positions(index, keys)
+        if not positions:
+            continue
+        weight = math.log(1 + total_books / len(positions))
+        for position in positions:
+            scores[position] = scores.get(position, 0.0) + weight
+
+    def sort_key(position: int):
+        published = index.books[position].get("publishedDate") or ""
+        return round(scores[position], 9), published, -position
+
+    top_positions = heapq.nlargest(limit, scores, key=sort_key)
+    return [index.books[position] for position in top_positions]
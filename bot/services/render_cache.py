@@ -0,0 +1,54 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from bot import config
+
+RENDER_CACHE_SIZE = getattr(config, "RENDER_CACHE_SIZE", 2000)
+
+
+def signature(parts: Iterable[str]) -> str:
+    # A short stable digest of a list of strings (e.g. the book ids of a view), usable
+    # in cache keys and safe to keep in persisted user_data.
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RenderCache:
+    # Finished messages (text and reply markup) keyed by a tuple whose first element is
+    # the view kind, e.g. ("all_books_list", catalog version, page, signature). Entries
+    # of an old catalog version are never asked for again and age out of the LRU.
+
+    def __init__(self, max_entries: int = RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Any]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        value = self._entries.get(key)
+        counters = self._stats.setdefault(key[0], {"hits": 0, "misses": 0})
+        if value is None:
+            counters["misses"] += 1
+            return None
+        counters["hits"] += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"entries": len(self._entries)}
+        for kind, counters in self._stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            stats[kind] = dict(counters, hit_rate=counters["hits"] / lookups if lookups else 0.0)
+        return stats
+
+
+renders = RenderCache()
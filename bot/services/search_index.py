@@ -0,0 +1,165 @@
+import bisect
+import functools
+import heapq
+import math
+import re
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+from bot import config
+
+SEARCH_RESULTS_LIMIT = getattr(config, "SEARCH_RESULTS_LIMIT", 100)
+# A query word also matches indexed words it is a prefix of ("толст" -> "толстой"),
+# at a lower weight than an exact match and for at most this many words.
+SEARCH_PREFIX_WEIGHT = 0.5
+SEARCH_MAX_PREFIX_EXPANSIONS = 50
+
+# A hit in the title counts more than one in the author, which counts more than
+# one somewhere in the description.
+FIELD_WEIGHTS = (("title", 3.0), ("author", 2.0), ("description", 1.0))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_RU_ENDINGS = (
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "ов", "ев", "ей", "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ие", "ые", "ах", "ях", "ом", "ем",
+    "ам", "ям", "ую", "юю", "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+)
+_EN_ENDINGS = ("ing", "ies", "es", "ed", "s")
+_MIN_STEM_LENGTH = 3
+
+
+@functools.lru_cache(maxsize=100_000)
+def normalize_word(word: str) -> str:
+    # Lower-case, fold ё into е and cut one common Russian or English ending, so
+    # "Войны", "войне" and "война" all become "войн".
+    word = word.lower().replace("ё", "е")
+    endings = _RU_ENDINGS if any("а" <= char <= "я" for char in word) else _EN_ENDINGS
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return [normalize_word(word) for word in _WORD_RE.findall(text)]
+
+
+def query_terms(query: str) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(tokenize(query)))
+
+
+class SearchIndex:
+    # Inverted index over title, author and description of the shared catalog.
+    # postings maps a normalised word to {position: weighted term frequency}; terms
+    # is the sorted vocabulary used for prefix lookups.
+
+    def __init__(self, books: List[dict]):
+        self.books = books
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.lengths: Dict[int, float] = {}
+        self.total_length = 0.0
+        for position, book in enumerate(books):
+            self._add(position, book)
+        self.terms = sorted(self.postings)
+
+    @staticmethod
+    def _weighted_terms(book: dict) -> Dict[str, float]:
+        weighted: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(book.get(field)):
+                weighted[term] = weighted.get(term, 0.0) + weight
+        return weighted
+
+    def _add(self, position: int, book: dict) -> List[str]:
+        weighted = self._weighted_terms(book)
+        new_terms = []
+        for term, frequency in weighted.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                new_terms.append(term)
+            posting[position] = frequency
+        length = sum(weighted.values())
+        self.lengths[position] = length
+        self.total_length += length
+        return new_terms
+
+    def _remove(self, position: int, book: dict) -> List[str]:
+        removed_terms = []
+        for term in self._weighted_terms(book):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(position, None)
+                if not posting:
+                    del self.postings[term]
+                    removed_terms.append(term)
+        self.total_length -= self.lengths.pop(position, 0.0)
+        return removed_terms
+
+    def apply_changes(self, changes) -> None:
+        # Same contract as CategoryIndex.apply_changes: (position, old, new) entries
+        # from an incremental catalog sync.
+        for position, old_book, new_book in changes:
+            if old_book is not None:
+                for term in self._remove(position, old_book):
+                    del self.terms[bisect.bisect_left(self.terms, term)]
+            for term in self._add(position, new_book):
+                bisect.insort(self.terms, term)
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        expansions = [(term, 1.0)] if term in self.postings else []
+        start = bisect.bisect_right(self.terms, term)
+        for candidate in self.terms[start:start + SEARCH_MAX_PREFIX_EXPANSIONS]:
+            if not candidate.startswith(term):
+                break
+            expansions.append((candidate, SEARCH_PREFIX_WEIGHT))
+        return expansions
+
+    def expands_fully(self, term: str) -> bool:
+        # False when term is a prefix of more words than _expand looks at.
+        start = bisect.bisect_right(self.terms, term)
+        return bisect.bisect_left(self.terms, term + "\U0010ffff", start) - start <= SEARCH_MAX_PREFIX_EXPANSIONS
+
+    def score(self, terms: Sequence[str], candidates: Optional[Collection[int]] = None) -> Dict[int, float]:
+        # BM25 over the weighted term frequencies. Each query word contributes its best
+        # matching indexed word per book, so a prefix that happens to match several
+        # forms of one word is not counted several times. With candidates, only those
+        # positions are scored (used to refine the results of a shorter query, see
+        # InlineResultCache).
+        total_books = len(self.lengths)
+        if not total_books:
+            return {}
+        average_length = self.total_length / total_books or 1.0
+
+        scores: Dict[int, float] = {}
+        for query_term in terms:
+            best: Dict[int, float] = {}
+            for term, match_weight in self._expand(query_term):
+                posting = self.postings[term]
+                idf = math.log(1 + (total_books - len(posting) + 0.5) / (len(posting) + 0.5))
+                if candidates is None or len(posting) <= len(candidates):
+                    entries = posting.items()
+                else:
+                    entries = ((position, posting[position]) for position in candidates if position in posting)
+                for position, frequency in entries:
+                    if candidates is not None and position not in candidates:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / average_length)
+                    score = match_weight * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    if score > best.get(position, 0.0):
+                        best[position] = score
+            for position, score in best.items():
+                scores[position] = scores.get(position, 0.0) + score
+        return scores
+
+    def top(self, scores: Dict[int, float], limit: int = SEARCH_RESULTS_LIMIT) -> List[dict]:
+        top_positions = heapq.nlargest(limit, scores, key=lambda position: (round(scores[position], 9), -position))
+        return [self.books[position] for position in top_positions]
+
+    def search(self, query: str, limit: int = SEARCH_RESULTS_LIMIT) -> List[dict]:
+        if limit <= 0:
+            return []
+        return self.top(self.score(query_terms(query)), limit)
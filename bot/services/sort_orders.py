@@ -0,0 +1,108 @@
+from typing import Dict, Iterable, List
+
+# "default" keeps the order the view was built in (backend order, relevance...).
+SORT_MODES = ("default", "cheap", "expensive", "newest", "title")
+
+
+def _price(book: dict) -> float:
+    # Books without a price are listed as free.
+    price = book.get("price")
+    return price if isinstance(price, (int, float)) else 0
+
+
+def _title(book: dict) -> str:
+    return (book.get("title") or "").casefold().replace("ё", "е")
+
+
+# (key, reverse) per mode. Python's sort is stable, also with reverse=True, so equal
+# keys keep the view's own order.
+SORT_KEYS: Dict[str, tuple] = {
+    "cheap": (_price, False),
+    "expensive": (_price, True),
+    "newest": (lambda book: book.get("publishedDate") or "", True),
+    "title": (_title, False),
+}
+
+
+# apply_changes re-sorts from scratch once more than 1/_RESORT_FRACTION of the books changed.
+_RESORT_FRACTION = 32
+
+
+def next_sort_mode(mode: str) -> str:
+    position = SORT_MODES.index(mode) if mode in SORT_MODES else 0
+    return SORT_MODES[(position + 1) % len(SORT_MODES)]
+
+
+def sort_books(books: List[dict], mode: str) -> List[dict]:
+    if mode not in SORT_KEYS:
+        return list(books)
+    key, reverse = SORT_KEYS[mode]
+    return sorted(books, key=key, reverse=reverse)
+
+
+class SortOrders:
+    # Derived from the catalog: for every sort mode, the catalog positions in sorted
+    # order (a permutation array). It is computed on the first use of a mode and then
+    # shared by every user until the catalog changes, so showing a page in some order
+    # is a slice of the permutation, or a walk over it for a selection of books. Its
+    # inverse, the rank of every position, sorts a short list of books without a walk.
+
+    def __init__(self, books: List[dict]):
+        self.books = books
+        self._orders: Dict[str, List[int]] = {}
+        self._ranks: Dict[str, List[int]] = {}
+
+    def order(self, mode: str) -> List[int]:
+        order = self._orders.get(mode)
+        if order is None:
+            key, reverse = SORT_KEYS[mode]
+            order = sorted(range(len(self.books)), key=lambda position: key(self.books[position]), reverse=reverse)
+            self._orders[mode] = order
+        return order
+
+    def apply_changes(self, changes) -> None:
+        # Same contract as CategoryIndex.apply_changes. Changed positions are taken out of
+        # every computed order and put back at their new place by binary search, instead
+        # of sorting the catalog again; a batch touching a large part of the catalog just
+        # drops the orders, to be sorted on their next use. Ranks are rebuilt on next use.
+        self._ranks.clear()
+        positions = list(dict.fromkeys(position for position, _, _ in changes))
+        if len(positions) * _RESORT_FRACTION > len(self.books):
+            self._orders.clear()
+            return
+        stale = {position for position, old_book, _ in changes if old_book is not None}
+        for mode, order in self._orders.items():
+            order[:] = [position for position in order if position not in stale]
+            for position in positions:
+                order.insert(self._insertion_point(order, mode, position), position)
+
+    def _insertion_point(self, order: List[int], mode: str, position: int) -> int:
+        # bisect_left by the mode's key, ties broken by position as the stable sort does.
+        key, reverse = SORT_KEYS[mode]
+        book_key = key(self.books[position])
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            other = order[middle]
+            other_key = key(self.books[other])
+            if other_key == book_key:
+                before = other < position
+            else:
+                before = other_key > book_key if reverse else other_key < book_key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def ranks(self, mode: str) -> List[int]:
+        ranks = self._ranks.get(mode)
+        if ranks is None:
+            ranks = [0] * len(self.books)
+            for rank, position in enumerate(self.order(mode)):
+                ranks[position] = rank
+            self._ranks[mode] = ranks
+        return ranks
+
+    def sort_positions(self, positions: Iterable[int], mode: str) -> List[int]:
+        return sorted(positions, key=self.ranks(mode).__getitem__)
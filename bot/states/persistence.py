@@ -0,0 +1,225 @@
+import asyncio
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from bot.states import session_manager
+
+_MISSING = object()
+
+
+class SqlitePersistence(BasePersistence):
+    # Stores PTB user/chat/bot data and conversation states; with the default "user_data"
+    # session backend the session_manager fields are part of user_data, so this is the
+    # only store of user state. PTB hands us the users touched since the last persistence
+    # run; those are buffered and written in a single transaction instead of rewriting
+    # every user on each run.
+    #
+    # Memory is bounded by activity, not by the number of users ever seen: user_data is
+    # not loaded at startup but per user, on the user's first update (refresh_user_data),
+    # and users idle for a while are handed back by take_idle_users so the application can
+    # drop them from memory. Their rows stay; they are loaded again when they return.
+
+    def __init__(self, path: str, update_interval: float = 5):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS chat_data (chat_id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS bot_data (id INTEGER PRIMARY KEY CHECK (id = 0), data BLOB NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "name TEXT NOT NULL, conv_key TEXT NOT NULL, state BLOB NOT NULL, PRIMARY KEY (name, conv_key))"
+            )
+        # Pickled data per key, None for a deleted entry.
+        self._dirty_users: Dict[int, Optional[bytes]] = {}
+        self._dirty_chats: Dict[int, Optional[bytes]] = {}
+        self._dirty_bot_data = _MISSING
+        self._dirty_conversations: Dict[Tuple[str, str], Optional[bytes]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self._last_seen: Dict[int, float] = {}
+        # Evicted by take_idle_users and not yet confirmed by PTB's drop_user_data call;
+        # _returned holds the live user_data of those who sent an update in between.
+        self._evicted: Set[int] = set()
+        self._returned: Dict[int, dict] = {}
+
+    # --- Loading ---
+    def _load_table(self, table: str, key_column: str) -> dict:
+        with self._lock:
+            rows = self._db.execute(f"SELECT {key_column}, data FROM {table}").fetchall()
+        return {key: pickle.loads(data) for key, data in rows}
+
+    async def get_user_data(self) -> dict:
+        # Loaded lazily per user, see refresh_user_data.
+        return {}
+
+    def _load_user(self, user_id: int) -> Optional[dict]:
+        pending = self._dirty_users.get(user_id, _MISSING)
+        if pending is not _MISSING:
+            return pickle.loads(pending) if pending is not None else None
+        with self._lock:
+            row = self._db.execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    async def get_chat_data(self) -> dict:
+        return self._load_table("chat_data", "chat_id")
+
+    async def get_bot_data(self) -> dict:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM bot_data WHERE id = 0").fetchone()
+        return pickle.loads(row[0]) if row else {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT conv_key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(conv_key)): pickle.loads(state) for conv_key, state in rows}
+
+    # --- Buffering ---
+    # Data is pickled here, on the event loop, when PTB hands it over: the write runs in a
+    # worker thread and must only see bytes, never objects handlers may be changing.
+    @staticmethod
+    def _dump(data) -> Optional[bytes]:
+        return pickle.dumps(data, pickle.HIGHEST_PROTOCOL) if data is not None else None
+
+    def _schedule_write(self) -> None:
+        # PTB gathers all update_* calls of one persistence run together; a task created
+        # now runs after all of them, so the whole run becomes a single transaction.
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_dirty())
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._dirty_conversations[(name, json.dumps(list(key)))] = self._dump(new_state)
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data) -> None:
+        self._dirty_users[user_id] = self._dump(data)
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data) -> None:
+        self._dirty_chats[chat_id] = self._dump(data)
+        self._schedule_write()
+
+    async def update_bot_data(self, data) -> None:
+        self._dirty_bot_data = self._dump(data)
+        self._schedule_write()
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if user_id in self._returned:
+            # Evicted, then back before this run: PTB skipped writing the user because of
+            # the drop, so the live data is written here instead of deleting the row.
+            self._evicted.discard(user_id)
+            self._dirty_users[user_id] = self._dump(self._returned.pop(user_id))
+        elif user_id in self._evicted:
+            self._evicted.discard(user_id)
+            return
+        else:
+            self._dirty_users[user_id] = None
+        self._schedule_write()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._dirty_chats[chat_id] = None
+        self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data) -> None:
+        # Called by PTB before every handler; loads the user's stored data on their first
+        # update since startup or eviction.
+        first_seen = user_id not in self._last_seen
+        self._last_seen[user_id] = time.monotonic()
+        if not first_seen:
+            return
+        if user_id in self._evicted:
+            self._returned[user_id] = user_data
+        stored = self._load_user(user_id) if user_id in self._dirty_users else \
+            await asyncio.to_thread(self._load_user, user_id)
+        for key, value in (stored or {}).items():
+            user_data.setdefault(key, value)
+
+    def take_idle_users(self, idle_seconds: float) -> List[int]:
+        # Users without an update for idle_seconds whose data is already written. The
+        # caller drops them from the application's user_data (Application.drop_user_data);
+        # the drop_user_data call that follows is then not a deletion.
+        if self._write_task is not None and not self._write_task.done():
+            return []
+        cutoff = time.monotonic() - idle_seconds
+        idle = [user_id for user_id, seen in self._last_seen.items()
+                if seen < cutoff and user_id not in self._dirty_users]
+        for user_id in idle:
+            del self._last_seen[user_id]
+            self._evicted.add(user_id)
+        return idle
+
+    async def refresh_chat_data(self, chat_id: int, chat_data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    # --- Writing ---
+    def _take_dirty(self):
+        dirty = (self._dirty_users, self._dirty_chats, self._dirty_bot_data, self._dirty_conversations)
+        self._dirty_users, self._dirty_chats, self._dirty_conversations = {}, {}, {}
+        self._dirty_bot_data = _MISSING
+        return dirty
+
+    def _restore_dirty(self, users: dict, chats: dict, bot_data, conversations: dict) -> None:
+        # Puts a batch that failed to write back; anything buffered since it was taken is
+        # newer and wins. It is written with the next persistence run or on shutdown.
+        for buffer, entries in ((self._dirty_users, users), (self._dirty_chats, chats),
+                                (self._dirty_conversations, conversations)):
+            for key, data in entries.items():
+                buffer.setdefault(key, data)
+        if self._dirty_bot_data is _MISSING:
+            self._dirty_bot_data = bot_data
+
+    def _write(self, users: dict, chats: dict, bot_data, conversations: dict) -> None:
+        with self._lock, self._db:
+            for table, key_column, entries in (("user_data", "user_id", users), ("chat_data", "chat_id", chats)):
+                upserts = [(key, data) for key, data in entries.items() if data is not None]
+                deletes = [(key,) for key, data in entries.items() if data is None]
+                self._db.executemany(f"INSERT OR REPLACE INTO {table} ({key_column}, data) VALUES (?, ?)", upserts)
+                self._db.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", deletes)
+            if bot_data is not _MISSING:
+                self._db.execute("INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (bot_data,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO conversations (name, conv_key, state) VALUES (?, ?, ?)",
+                [(name, conv_key, state) for (name, conv_key), state in conversations.items() if state is not None]
+            )
+            self._db.executemany(
+                "DELETE FROM conversations WHERE name = ? AND conv_key = ?",
+                [(name, conv_key) for (name, conv_key), state in conversations.items() if state is None]
+            )
+
+    async def _write_dirty(self) -> None:
+        # Runs as a fire-and-forget task, so errors are handled here or not at all.
+        dirty = self._take_dirty()
+        try:
+            await asyncio.to_thread(self._write, *dirty)
+        except Exception as e:
+            print(f"Persisting bot data failed, will retry: {e}")
+            self._restore_dirty(*dirty)
+        # Separately, so a session store error never re-queues a batch already committed.
+        try:
+            await asyncio.to_thread(session_manager.flush)
+        except Exception as e:
+            print(f"Session flush failed, will retry: {e}")
+
+    async def flush(self) -> None:
+        if self._write_task is not None and not self._write_task.done():
+            await self._write_task
+        self._write(*self._take_dirty())
+        session_manager.flush()
+        with self._lock:
+            self._db.close()
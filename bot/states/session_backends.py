@@ -0,0 +1,200 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Mapping, Optional
+
+
+class UserDataSessionBackend:
+    # Keeps each session in the user's PTB user_data (under "session"), so it is stored,
+    # loaded and evicted together with the rest of the user's state by SqlitePersistence
+    # instead of in a second store. Until bind() is given the application's user_data
+    # (scripts, tests), a plain dict stands in for it.
+    KEY = "session"
+
+    def __init__(self):
+        self._user_data: Mapping[int, dict] = defaultdict(dict)
+
+    def bind(self, user_data: Mapping[int, dict]) -> None:
+        # Application.user_data creates a user's dict on first access, like defaultdict.
+        self._user_data = user_data
+
+    def get(self, user_id) -> Optional[Dict]:
+        return self._user_data[user_id].get(self.KEY)
+
+    def set(self, user_id, session: Dict) -> None:
+        self._user_data[user_id][self.KEY] = session
+
+    def delete(self, user_id) -> None:
+        self._user_data[user_id].pop(self.KEY, None)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionBackend:
+    # LRU of user sessions. Entries idle for longer than ttl seconds, or pushed out by
+    # max_entries newer ones, are dropped.
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def get(self, user_id) -> Optional[Dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries[user_id] = (time.monotonic() + self.ttl, session)
+        self._entries.move_to_end(user_id)
+        return session
+
+    def set(self, user_id, session: Dict) -> None:
+        self._entries[user_id] = (time.monotonic() + self.ttl, session)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, user_id) -> None:
+        self._entries.pop(user_id, None)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSessionBackend:
+    # Durable sessions. Reads are served by an in-memory LRU and fall back to SQLite on
+    # a miss; writes land in memory and are written behind in batches by flush(). Once
+    # flush_batch users are dirty a flush is started in a worker thread, so the event
+    # loop never waits for a write transaction; the owner may also call flush() itself.
+
+    def __init__(self, path: str, max_entries: int = 10000, memory_ttl: float = 3600,
+                 ttl: float = 30 * 24 * 3600, flush_batch: int = 100):
+        self.ttl = ttl
+        self.flush_batch = flush_batch
+        self._memory = MemorySessionBackend(max_entries=max_entries, ttl=memory_ttl)
+        # _dirty: changed since the last flush; _flushing: the batch being written now.
+        # Both are read by get() so a session is never looked up in SQLite before it got there.
+        # Sessions are kept there as JSON (None = deleted), serialised by the caller's thread
+        # when they change, so a flush thread never reads a dict that is being modified.
+        self._dirty: Dict[int, Optional[str]] = {}
+        self._flushing: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        # Held for a whole flush (taking a batch and writing it), so batches reach the
+        # database in the order they were taken. Never taken by get/set.
+        self._write_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            # WAL lets get() read through its own connection while a flush is writing.
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+
+    def get(self, user_id) -> Optional[Dict]:
+        session = self._memory.get(user_id)
+        if session is not None:
+            return session
+        with self._lock:
+            pending = self._dirty if user_id in self._dirty else self._flushing
+            if user_id in pending:
+                data = pending[user_id]
+            else:
+                row = self._reader.execute(
+                    "SELECT data FROM sessions WHERE user_id = ? AND updated_at >= ?",
+                    (user_id, time.time() - self.ttl)
+                ).fetchone()
+                data = row[0] if row else None
+        session = json.loads(data) if data is not None else None
+        if session is not None:
+            self._memory.set(user_id, session)
+        return session
+
+    def set(self, user_id, session: Dict) -> None:
+        self._memory.set(user_id, session)
+        self._mark_dirty(user_id, session)
+
+    def delete(self, user_id) -> None:
+        self._memory.delete(user_id)
+        self._mark_dirty(user_id, None)
+
+    def _mark_dirty(self, user_id, session: Optional[Dict]) -> None:
+        data = json.dumps(session) if session is not None else None
+        with self._lock:
+            self._dirty[user_id] = data
+            should_flush = len(self._dirty) >= self.flush_batch and self._flush_task is None
+        if should_flush:
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not called from the event loop (scripts, tests): nothing to keep responsive.
+            self.flush()
+            return
+        self._flush_task = loop.create_task(self._flush_in_background())
+
+    async def _flush_in_background(self) -> None:
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            # The batch is back in _dirty; the next change past flush_batch retries it.
+            print(f"Session flush failed, will retry: {e}")
+        finally:
+            self._flush_task = None
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                batch, self._dirty = self._dirty, {}
+                self._flushing = batch
+            try:
+                self._write(batch)
+            except BaseException:
+                with self._lock:
+                    # Changes made while the batch was being written are newer; keep those.
+                    for user_id, data in batch.items():
+                        self._dirty.setdefault(user_id, data)
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+
+    def _write(self, batch: Dict[int, Optional[str]]) -> None:
+        now = time.time()
+        upserts = [(user_id, data, now) for user_id, data in batch.items() if data is not None]
+        deletes = [(user_id,) for user_id, data in batch.items() if data is None]
+        with self._db:
+            if upserts:
+                self._db.executemany(
+                    "INSERT INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    upserts
+                )
+            if deletes:
+                self._db.executemany("DELETE FROM sessions WHERE user_id = ?", deletes)
+            self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+
+    def close(self) -> None:
+        self.flush()
+        with self._write_lock:
+            self._db.close()
+        self._reader.close()
@@ -1,12 +1,44 @@
-sessions: dict = {}
+import time
+
+from bot import config
+from bot.states.session_backends import MemorySessionBackend, SqliteSessionBackend, UserDataSessionBackend
+
+# "user_data" keeps sessions in PTB's user_data, persisted by SqlitePersistence along
+# with the rest of the user's state; "sqlite" and "memory" are stores of their own.
+SESSION_BACKEND = getattr(config, "SESSION_BACKEND", "user_data")
+SESSION_DB_PATH = getattr(config, "SESSION_DB_PATH", "bot_state.sqlite3")
+SESSION_CACHE_SIZE = getattr(config, "SESSION_CACHE_SIZE", 10000)
+SESSION_MEMORY_TTL_SECONDS = getattr(config, "SESSION_MEMORY_TTL_SECONDS", 3600)
+SESSION_TTL_SECONDS = getattr(config, "SESSION_TTL_SECONDS", 30 * 24 * 3600)
+SESSION_FLUSH_BATCH = getattr(config, "SESSION_FLUSH_BATCH", 100)
+PROFILE_CACHE_TTL_SECONDS = getattr(config, "PROFILE_CACHE_TTL_SECONDS", 60)
+
+
+def _create_backend():
+    if SESSION_BACKEND == "user_data":
+        return UserDataSessionBackend()
+    if SESSION_BACKEND == "memory":
+        return MemorySessionBackend(max_entries=SESSION_CACHE_SIZE, ttl=SESSION_MEMORY_TTL_SECONDS)
+    if SESSION_BACKEND == "sqlite":
+        return SqliteSessionBackend(
+            SESSION_DB_PATH,
+            max_entries=SESSION_CACHE_SIZE,
+            memory_ttl=SESSION_MEMORY_TTL_SECONDS,
+            ttl=SESSION_TTL_SECONDS,
+            flush_batch=SESSION_FLUSH_BATCH,
+        )
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+
+
+sessions = _create_backend()
 
 def get_session(user_id):
     return sessions.get(user_id)
 
 def set_session_data(user_id, key, value):
-    if user_id not in sessions:
-        sessions[user_id] = {}
-    sessions[user_id][key] = value
+    session = sessions.get(user_id) or {}
+    session[key] = value
+    sessions.set(user_id, session)
 
 def get_session_data(user_id, key, default=None):
     session = get_session(user_id)
@@ -16,13 +48,35 @@ def clear_session_data(user_id, key):
     session = get_session(user_id)
     if session and key in session:
         del session[key]
+        sessions.set(user_id, session)
 
 def clear_entire_session(user_id):
-    if user_id in sessions:
-        del sessions[user_id]
+    sessions.delete(user_id)
+
+def bind_user_data(user_data):
+    if hasattr(sessions, "bind"):
+        sessions.bind(user_data)
+
+def flush():
+    sessions.flush()
+
+def close():
+    sessions.close()
 
 def get_cookies(user_id):
     return get_session_data(user_id, "cookies")
 
 def get_user(user_id):
-    return get_session_data(user_id, "user")
\ No newline at end of file
+    return get_session_data(user_id, "user")
+
+def get_cached_profile(user_id):
+    entry = get_session_data(user_id, "profile_cache")
+    if entry and time.time() - entry["fetched_at"] < PROFILE_CACHE_TTL_SECONDS:
+        return entry["data"]
+    return None
+
+def set_cached_profile(user_id, profile):
+    set_session_data(user_id, "profile_cache", {"data": profile, "fetched_at": time.time()})
+
+def invalidate_profile(user_id):
+    clear_session_data(user_id, "profile_cache")
@@ -1,7 +1,9 @@
 import base64
 from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
 from bot.states import session_manager
+from bot.services.file_id_cache import file_ids
 
 async def check_user_logged_in(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     user_id = update.effective_user.id
@@ -19,6 +21,21 @@ async def handle_api_error(update: Update, result: dict, default_message: str =
     await update.message.reply_text(full_error_message)
 
 
+async def reply_photo_cached(message, photo_url: str, **kwargs):
+    # Reuse the file_id Telegram assigned on the first send of this URL; fall back to
+    # the URL if Telegram no longer accepts the cached file_id.
+    cached_file_id = file_ids.get(photo_url)
+    if cached_file_id:
+        try:
+            return await message.reply_photo(photo=cached_file_id, **kwargs)
+        except BadRequest:
+            file_ids.discard(photo_url)
+    sent_message = await message.reply_photo(photo=photo_url, **kwargs)
+    if sent_message.photo:
+        file_ids.put(photo_url, sent_message.photo[-1].file_id)
+    return sent_message
+
+
 def encode_image_to_base64(photo_bytes: bytearray, mime_type: str = "image/jpeg") -> str:
     image_base64 = base64.b64encode(photo_bytes).decode("utf-8")
     return f"data:{mime_type};base64,{image_base64}"
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Awaitable, Dict
+
+from telegram.ext import BaseUpdateProcessor
+
+# PTB takes its own semaphore before calling do_process_update; it is given this limit
+# so it never blocks, and the real limit is applied in do_process_update instead.
+_PTB_SEMAPHORE_LIMIT = 2 ** 31 - 1
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    # Runs updates of different users concurrently (up to max_concurrent_updates at a
+    # time) while keeping each user's own updates strictly in arrival order, which the
+    # ConversationHandlers and session_manager rely on. The per-user lock is taken before
+    # a concurrency slot, so a user with a queue of updates does not hold slots idle.
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(_PTB_SEMAPHORE_LIMIT)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._user_pending: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        user_id = user.id
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        self._user_pending[user_id] = self._user_pending.get(user_id, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            self._user_pending[user_id] -= 1
+            if not self._user_pending[user_id]:
+                del self._user_pending[user_id]
+                del self._user_locks[user_id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,59 @@
+# Memory of the shared catalog kept as decoded JSON dicts vs as BookRecords.
+#
+#   PYTHONPATH=. python scripts/benchmark_catalog_memory.py [--books 100000]
+#
+# The books are synthetic but shaped like /api/books items (nested owner and
+# categories, a ~300 character description). Each layout is measured with tracemalloc
+# after the catalog is built, so temporary objects are not counted.
+import argparse
+import json
+import random
+import tracemalloc
+
+from bot.services.catalog_records import BookRecord
+
+
+def synthetic_books(count: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    return [
+        {
+            "_id": "%024x" % i,
+            "title": f"Book {i}",
+            "author": f"Author {i % 500}",
+            "description": "".join(rnd.choice("abcdefgh ") for _ in range(300)),
+            "price": rnd.randint(1, 100),
+            "language": rnd.choice(["ru", "en"]),
+            "type": "paper",
+            "publishedDate": "2020-01-01T00:00:00.000Z",
+            "updatedAt": "2024-01-01T00:00:00.000Z",
+            "owner": {"_id": "u%d" % (i % 100), "name": "n"},
+            "image": "https://example.com/cover.jpg",
+            "categories": [{"_id": "c%d" % (i % 30), "name": "Cat %d" % (i % 30)}],
+        }
+        for i in range(count)
+    ]
+
+
+def measure(build) -> float:
+    tracemalloc.start()
+    catalog = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del catalog
+    return size / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100_000)
+    args = parser.parse_args()
+
+    payload = json.dumps(synthetic_books(args.books))
+    dicts_mb = measure(lambda: json.loads(payload))
+    records_mb = measure(lambda: [BookRecord(book) for book in json.loads(payload)])
+    print(f"{args.books} books: dicts {dicts_mb:.1f} MB, records {records_mb:.1f} MB "
+          f"({records_mb / dicts_mb:.0%} of dicts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Checks the ?updatedSince= delta contract of GET /api/books that incremental catalog
+# sync (CATALOG_SYNC_MODE = "incremental") relies on.
+#
+#   PYTHONPATH=. python scripts/catalog_delta_standin.py
+#   PYTHONPATH=. python scripts/catalog_delta_standin.py --backend http://localhost:5001
+#
+# Without --backend, a local aiohttp stand-in serves the books and implements the
+# contract: with updatedSince, only books whose updatedAt is newer are returned, deleted
+# ones included and flagged with isDeleted. The bot's catalog is synced, the stand-in's
+# books are changed, and after an incremental sync the catalog and its derived sort
+# orders, facet and search indexes must equal a full reload.
+#
+# With --backend, a real backend is asked for its books and then for the books updated
+# since the newest updatedAt; the delta must only hold books newer than that.
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+from bot import config
+
+STANDIN_PORT = 18082
+
+
+def synthetic_book(i: int, rnd: random.Random, updated_at: str) -> dict:
+    return {
+        "_id": "%024x" % i,
+        "title": rnd.choice(["Мастер", "Идиот", "Чайка", "Нос"]) + f" {i}",
+        "author": f"Author {i % 7}",
+        "description": "слова " * rnd.randint(1, 5),
+        "price": rnd.choice([None, 0, 5, 10, 25.5]),
+        "language": rnd.choice(["ru", "en"]),
+        "type": rnd.choice(["paper", "ebook"]),
+        "publishedDate": f"20{rnd.randint(10, 24)}-01-01T00:00:00.000Z",
+        "updatedAt": updated_at,
+        "owner": {"_id": "u%d" % (i % 3)},
+        "categories": [{"_id": "c%d" % (i % 4), "name": "Cat %d" % (i % 4)}],
+    }
+
+
+def standin(books: dict, requests: list) -> web.Application:
+    async def list_books(request: web.Request) -> web.Response:
+        updated_since = request.query.get("updatedSince")
+        requests.append(updated_since)
+        if updated_since is None:
+            data = [book for book in books.values() if not book.get("isDeleted")]
+        else:
+            data = [book for book in books.values() if book["updatedAt"] > updated_since]
+        return web.json_response(data)
+
+    app = web.Application()
+    app.router.add_get("/api/books", list_books)
+    return app
+
+
+def snapshot(catalog) -> dict:
+    from bot.services.facet_index import FacetIndex
+    from bot.services.search_index import SearchIndex
+    from bot.services.sort_orders import SORT_KEYS, SortOrders
+
+    # The stand-in lists new books last, where an incremental sync appends them, so
+    # positions (and with them ties in the sort orders) match those of a full reload.
+    books = catalog._books or []
+    sort_orders = catalog.derived("sort_orders", SortOrders)
+    facets = catalog.derived("facet_index", FacetIndex)
+    search = catalog.derived("search_index", SearchIndex)
+    ids = lambda positions: [books[position].get("_id") for position in positions]
+    return {
+        "books": sorted(repr(sorted(book.to_dict().items())) for book in books),
+        "orders": {mode: ids(sort_orders.order(mode)) for mode in SORT_KEYS},
+        "facets": {(facet, value): sorted(ids(position for position in range(len(books))
+                                              if bitmap >> position & 1))
+                   for facet, values in facets.bitmaps.items() for value, bitmap in values.items()},
+        "search": sorted(ids(search.score(["мастер"]))),
+    }
+
+
+async def check_standin() -> None:
+    config.BACKEND_URL = f"http://127.0.0.1:{STANDIN_PORT}"
+    config.CATALOG_SYNC_MODE = "incremental"
+    from bot.services import api_client
+    from bot.services.sort_orders import SortOrders
+
+    rnd = random.Random(7)
+    clock = iter(f"2025-01-01T00:{minute // 60:02d}:{minute % 60:02d}.000Z" for minute in range(3600))
+    books = {}
+    for i in range(200):
+        book = synthetic_book(i, rnd, next(clock))
+        books[book["_id"]] = book
+    requests = []
+    runner = web.AppRunner(standin(books, requests))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STANDIN_PORT).start()
+    await api_client.init_session()
+    try:
+        catalog = api_client.catalog
+        await catalog.get_books()
+        # Builds the derived structures, so the sync below has to patch them.
+        patched = catalog.derived("sort_orders", SortOrders)
+        snapshot(catalog)
+
+        for i in rnd.sample(range(200), 15):
+            books["%024x" % i] = synthetic_book(i, rnd, next(clock))
+        for i in range(200, 205):
+            books["%024x" % i] = synthetic_book(i, rnd, next(clock))
+        catalog.invalidate()
+        await catalog.get_books()
+        assert requests[-1] is not None, "the second sync was not incremental"
+        assert catalog.derived("sort_orders", SortOrders) is patched, "sort orders were rebuilt"
+        incremental = snapshot(catalog)
+
+        catalog._fetch_changes = None
+        catalog.invalidate()
+        await catalog.get_books()
+        assert requests[-1] is None
+        assert snapshot(catalog) == incremental, "incremental sync differs from a full reload"
+
+        # A deletion reported in the delta is applied as well.
+        catalog._fetch_changes = api_client._fetch_changed_books
+        deleted_id = "%024x" % 3
+        books[deleted_id] = dict(books[deleted_id], isDeleted=True, updatedAt=next(clock))
+        catalog.invalidate()
+        await catalog.get_books()
+        assert requests[-1] is not None and catalog.get_by_id(deleted_id) is None
+        print(f"stand-in ok: {len(requests)} fetches, incremental sync matches a full reload")
+    finally:
+        await api_client.close_session()
+        await runner.cleanup()
+
+
+async def check_backend(backend_url: str) -> None:
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{backend_url}/api/books") as response:
+            response.raise_for_status()
+            books = await response.json(content_type=None)
+        newest = max((book.get("updatedAt") or "" for book in books), default="")
+        assert newest, "the backend does not send updatedAt, incremental sync cannot work"
+        async with session.get(f"{backend_url}/api/books", params={"updatedSince": newest}) as response:
+            response.raise_for_status()
+            delta = await response.json(content_type=None)
+    assert isinstance(delta, list), "the delta is not a list of books"
+    older = [book.get("_id") for book in delta if (book.get("updatedAt") or "") <= newest]
+    assert not older, f"updatedSince is ignored: {len(older)} of {len(delta)} books are not newer"
+    print(f"backend ok: {len(books)} books, {len(delta)} updated since {newest}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", help="check a running backend instead of the stand-in")
+    args = parser.parse_args()
+    if args.backend:
+        asyncio.run(check_backend(args.backend.rstrip("/")))
+    else:
+        asyncio.run(check_standin())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Runs build_application() in webhook mode against local stand-ins, without Telegram.
+#
+#   PYTHONPATH=. python scripts/webhook_standin.py
+#
+# A small aiohttp server plays the Bot API (getMe, setWebhook, sendMessage...), and the
+# bot's webhook listens on localhost. A /start update is POSTed to the webhook with the
+# X-Telegram-Bot-Api-Secret-Token header the way Telegram sends it, and the script checks
+# that the bot answers through the Bot API; the same update with a wrong secret must be
+# rejected with 403. bot.config only needs TELEGRAM_TOKEN, the rest is set here.
+import asyncio
+import os
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from bot import config
+
+API_PORT = 18081
+WEBHOOK_PORT = 18443
+SECRET = "standin-secret"
+CHAT_ID = 1000
+
+config.TELEGRAM_API_URL = f"http://127.0.0.1:{API_PORT}"
+config.SESSION_DB_PATH = os.path.join(tempfile.mkdtemp(), "webhook_standin.sqlite3")
+config.STATS_LOG_INTERVAL_SECONDS = 0
+
+from bot import main as bot_main  # noqa: E402  (reads the config above at import)
+
+
+def start_update(update_id: int) -> dict:
+    user = {"id": CHAT_ID, "is_bot": False, "first_name": "Stand-in"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": user,
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def bot_api(calls: list) -> web.Application:
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        calls.append((method, params))
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Stand-in", "username": "standin_bot"}
+        elif method == "sendMessage":
+            result = {"message_id": len(calls), "date": int(time.time()), "text": params.get("text", ""),
+                      "chat": {"id": int(params["chat_id"]), "type": "private"}}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handle)
+    return app
+
+
+async def run() -> None:
+    calls = []
+    runner = web.AppRunner(bot_api(calls))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+
+    # The same steps as Application.run_webhook, which owns the event loop itself.
+    app = bot_main.build_application()
+    await app.initialize()
+    await app.post_init(app)
+    await app.updater.start_webhook(
+        listen="127.0.0.1",
+        port=WEBHOOK_PORT,
+        url_path=bot_main.WEBHOOK_PATH,
+        webhook_url=f"https://example.invalid/{bot_main.WEBHOOK_PATH}",
+        secret_token=SECRET,
+    )
+    await app.start()
+    try:
+        url = f"http://127.0.0.1:{WEBHOOK_PORT}/{bot_main.WEBHOOK_PATH}"
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=start_update(1),
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+                assert response.status == 403, f"wrong secret: HTTP {response.status}"
+            async with session.post(url, json=start_update(2),
+                                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                assert response.status == 200, f"right secret: HTTP {response.status}"
+
+        for _ in range(50):
+            replies = [params for method, params in calls if method == "sendMessage"]
+            if replies:
+                break
+            await asyncio.sleep(0.1)
+        assert replies and int(replies[0]["chat_id"]) == CHAT_ID, "the bot did not answer /start"
+        assert any(method == "setWebhook" and params.get("secret_token") == SECRET for method, params in calls)
+        print(f"webhook ok: wrong secret rejected, /start answered ({len(replies)} message(s))")
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.post_shutdown(app)
+        await app.shutdown()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())